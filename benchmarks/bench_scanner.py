@@ -0,0 +1,436 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Offline benchmark suite. It generates a synthetic website (N pages, link fan-out, page
+size, DEIA term density, share of binary links), serves it from a local HTTP server and
+runs every scanner implementation against the same fixture:
+    scraper     -- idDEIA_scraper.crawl_website (and crawl_website_concurrent, crawl_website_sharded)
+    gpt4o       -- _genAICodes/GPT4o_idDEIAScrapper.py
+    grok3       -- _genAICodes/Grok3_idDEIAScrapper.py
+For each run it reports pages/sec, fetch/parse/match time per page, peak memory and the
+DEIA term totals next to the exact number of terms the generator put in the site, and
+checks that the sharded crawl (SHARDS) finds the same totals as crawl_website. It also
+times get_dei_phrases, the term index cache and identify_dei_phrases (per tokenizer), and
+checks the memory per URL of the seen-URL sets (SEEN_URLS) against their documented ceiling.
+Each implementation runs in its own process, so peak memory is measured per run.
+With --throttle the server refuses requests above that rate with 429/503 and Retry-After,
+like a government host under load; the totals show whether any page was lost.
+
+    python benchmarks/bench_scanner.py --pages 300 --fanout 8 --words 800 --density 0.02
+    python benchmarks/bench_scanner.py --impls scraper --concurrency 8 --throttle 50
+------------------------------------------------------
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# DEIA terms put in the pages; every implementation has all of them in its term list
+PROBE_TERMS = ["diversity", "equity", "inclusion", "accessibility", "equal opportunity", "belonging"]
+
+# Filler words: none of them is a DEIA term of any implementation
+FILLER_WORDS = ("program office service public federal agency mission report data grant policy research "
+                "center health energy water project support staff budget review contract training safety "
+                "transport weather science forest museum library bridge highway permit license travel").split()
+
+# Documented memory ceiling per URL of the seen-URL sets, in bytes (see README: Large sites)
+SEEN_URL_CEILINGS = {'fingerprint': 24, 'bloom': 2}
+
+# Leading bytes of the binary files on the site (PDF with an extension, ZIP without one)
+PDF_BYTES = b"%PDF-1.4\n" + bytes(range(256)) * 64
+ZIP_BYTES = b"PK\x03\x04" + bytes(range(256)) * 64
+
+# Function to generate the synthetic website: returns ({path: (content type, body)}, expected term totals)
+def generate_site(pages=200, fanout=8, words=800, density=0.02, binary_share=0.1, seed=14151):
+    rng = random.Random(seed)
+    site = {}
+    expected = Counter()
+
+    # Shared header/footer on every page, like a real CMS template
+    nav = '<nav>\n<a href="/">Home</a>\n<a href="/page/1.html">About</a>\n<a href="/page/2.html">Accessibility</a>\n</nav>'
+    footer = '<footer>\nFederal agency footer. <a href="/page/3.html#top">Contact</a>\n</footer>'
+
+    binary_count = 0
+    for page in range(pages):
+        body_words = []
+        for _ in range(words):
+            if rng.random() < density:
+                term = rng.choice(PROBE_TERMS)
+                body_words.append(term.title() if rng.random() < 0.3 else term)
+                expected[term] += 1
+            else:
+                body_words.append(rng.choice(FILLER_WORDS))
+        paragraphs = "\n".join(f"<p>{' '.join(body_words[i:i + 60])}.</p>" for i in range(0, len(body_words), 60))
+
+        links = [f'<a href="/page/{(page + 1) % pages}.html">next</a>']
+        for _ in range(fanout):
+            if rng.random() < binary_share:
+                binary_count += 1
+                if binary_count % 2:
+                    links.append(f'<a href="/files/report{binary_count}.pdf">report</a>')
+                    site[f"/files/report{binary_count}.pdf"] = ("application/pdf", PDF_BYTES)
+                else:
+                    links.append(f'<a href="/download/{binary_count}">download</a>')
+                    site[f"/download/{binary_count}"] = ("application/octet-stream", ZIP_BYTES)
+            else:
+                links.append(f'<a href="/page/{rng.randrange(pages)}.html?utm_source=bench">more</a>')
+
+        html = (f"<!DOCTYPE html>\n<html>\n<head>\n<title>Page {page}</title>\n<script>var page = {page};</script>\n</head>\n"
+                f"<body>\n{nav}\n<main>\n{paragraphs}\n<div>{' '.join(links)}</div>\n</main>\n{footer}\n</body>\n</html>\n")
+        site[f"/page/{page}.html"] = ("text/html; charset=utf-8", html.encode("utf-8"))
+
+    # Start page without any DEIA terms, so the expected totals count every content page once
+    site["/"] = ("text/html", b'<!DOCTYPE html>\n<html>\n<body>\n<a href="/page/0.html">Start</a>\n</body>\n</html>\n')
+    expected["accessibility"] += pages  # the nav link text on every page
+    return site, expected
+
+# Function to serve the site from a local HTTP server in a background thread; returns (server, base url)
+#   throttle -- requests per second the server accepts; above it, requests are refused with
+#               429 Too Many Requests (every other one 503) and "Retry-After: 1"; the number of
+#               refusals is kept in server.throttled
+def serve_site(site, throttle=None):
+    burst = max(1.0, (throttle or 0) / 10)
+    bucket = {'tokens': burst, 'last': time.monotonic()}
+    bucket_lock = threading.Lock()
+
+    # Function to take a token from the server's bucket; False when the request is over the rate
+    def admit():
+        with bucket_lock:
+            now = time.monotonic()
+            bucket['tokens'] = min(burst, bucket['tokens'] + (now - bucket['last']) * throttle)
+            bucket['last'] = now
+            if bucket['tokens'] < 1:
+                server.throttled += 1
+                return False
+            bucket['tokens'] -= 1
+            return True
+
+    class SiteHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like a real server
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def do_GET(self):
+            if throttle and not admit():
+                self.send_response(503 if server.throttled % 2 else 429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            entry = site.get(self.path.split("?", 1)[0].split("#", 1)[0])
+            if entry is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            content_type, body = entry
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class SiteServer(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # scanners hang up on binary downloads on purpose; that is not an error here
+            if not isinstance(sys.exc_info()[1], ConnectionError):
+                super().handle_error(request, client_address)
+
+    server = SiteServer(("127.0.0.1", 0), SiteHandler)
+    server.throttled = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+class StageTimer:
+    # Accumulate wall time per stage (fetch, parse, match) across threads
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = Counter()
+        self.calls = Counter()
+
+    # Function to wrap a function so its time is added to a stage
+    def wrap(self, stage, function):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    self.seconds[stage] += elapsed
+                    self.calls[stage] += 1
+        return timed
+
+# Function to load one of the _genAICodes scripts as a module
+def load_genai_module(file_name):
+    path = os.path.join(REPO_DIR, "_genAICodes", file_name)
+    spec = importlib.util.spec_from_file_location(file_name[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Function to run the idDEIA_scraper crawl; returns (pages scanned, term totals)
+def run_scraper(base_url, timer, concurrency):
+    import idDEIA_scraper as scraper
+
+    scraper.fetch_html = timer.wrap("fetch", scraper.fetch_html)
+    scraper.extract_page = timer.wrap("parse", scraper.extract_page)
+    scraper.count_dei_phrases = timer.wrap("match", scraper.count_dei_phrases)
+
+    dei_phrases = scraper.get_phrase_matcher(scraper.get_dei_phrases(False, interactive=False))
+    if concurrency > 1:
+        totals = scraper.crawl_website_concurrent(base_url, dei_phrases=dei_phrases,
+                                                  max_workers=concurrency, max_per_host=concurrency)
+    else:
+        totals = scraper.crawl_website(base_url, dei_phrases=dei_phrases)
+    return timer.calls["parse"], totals
+
+# Function to run the GPT-4o generated scanner; returns (pages scanned, term totals)
+def run_gpt4o(base_url, timer, concurrency):
+    import requests
+    module = load_genai_module("GPT4o_idDEIAScrapper.py")
+    requests.get = timer.wrap("fetch", requests.get)
+    module.BeautifulSoup = timer.wrap("parse", module.BeautifulSoup)
+    module.count_deia_phrases = timer.wrap("match", module.count_deia_phrases)
+
+    results = module.scrape_deia_content(base_url)
+    totals = Counter()
+    for counts in results.values():
+        totals.update(counts)
+    return len(results), totals
+
+# Function to run the Grok 3 generated scanner; returns (pages scanned, term totals)
+#   its matching runs inline in the crawl loop, so "match" is not measured separately
+def run_grok3(base_url, timer, concurrency, max_pages=None):
+    import requests
+    module = load_genai_module("Grok3_idDEIAScrapper.py")
+    requests.get = timer.wrap("fetch", requests.get)
+    module.BeautifulSoup = timer.wrap("parse", module.BeautifulSoup)
+
+    results = module.crawl_website(base_url, max_pages=max_pages or 10 ** 6)
+    totals = Counter()
+    for counts in results.values():
+        totals.update(counts)
+    return len(results), totals
+
+# Function to run the idDEIA_scraper crawl with SHARDS worker processes; returns (pages scanned, term totals)
+#   the pages are parsed and matched in the worker processes, so the stages are not timed
+def run_scraper_sharded(base_url, timer, shards):
+    import idDEIA_scraper as scraper
+
+    class PageCounter:
+        pages = 0
+        def write(self, result):
+            self.pages += 1
+
+    dei_phrases = scraper.get_phrase_matcher(scraper.get_dei_phrases(False, interactive=False))
+    pages = PageCounter()
+    with tempfile.TemporaryDirectory() as store_dir:
+        totals = scraper.crawl_website_sharded(base_url, dei_phrases=dei_phrases, shards=shards,
+                                               store_path=os.path.join(store_dir, "shards.sqlite"),
+                                               results_writer=pages)
+    return pages.pages, totals
+
+IMPLEMENTATIONS = {'scraper': run_scraper, 'sharded': run_scraper_sharded, 'gpt4o': run_gpt4o, 'grok3': run_grok3}
+
+# Function to run one implementation in a child process and send back its measurements
+def bench_child(name, base_url, concurrency, pipe):
+    import contextlib
+    import io
+    timer = StageTimer()
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # the scanners print every page
+            pages, totals = IMPLEMENTATIONS[name](base_url, timer, concurrency)
+        error = None
+    except Exception as e:
+        pages, totals, error = 0, Counter(), f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - started
+
+    pipe.send({
+        'name': name if concurrency <= 1 else f"{name} x{concurrency}",
+        'pages': pages,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 1) if elapsed else 0.0,
+        'ms_per_page': {stage: round(1000 * seconds / max(pages, 1), 3) for stage, seconds in timer.seconds.items()},
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'totals': {term: totals.get(term, 0) for term in PROBE_TERMS},
+        'error': error,
+    })
+    pipe.close()
+
+# Function to run one implementation in a fresh process
+def bench_implementation(name, base_url, concurrency=1):
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    parent_end, child_end = context.Pipe(duplex=False)
+    process = context.Process(target=bench_child, args=(name, base_url, concurrency, child_end))
+    process.start()
+    result = parent_end.recv()
+    process.join()
+    return result
+
+# Function to time the term list functions and the phrase matching on the site's pages
+def bench_term_functions(site, repeat=3):
+    import idDEIA_scraper as scraper
+    from idDEIA_parser import extract_page
+    results = {}
+
+    started = time.perf_counter()
+    dei_phrases = scraper.get_dei_phrases(False, interactive=False)
+    results['get_dei_phrases(False) ms'] = round(1000 * (time.perf_counter() - started), 2)
+    try:
+        started = time.perf_counter()
+        scraper.get_dei_phrases(True, interactive=False)
+        results['get_dei_phrases(True) ms'] = round(1000 * (time.perf_counter() - started), 2)
+    except LookupError:
+        results['get_dei_phrases(True) ms'] = "skipped (WordNet not installed)"
+
+    scraper.TERM_INDEX_CACHE = tempfile.mkdtemp(prefix="deia-bench-")
+    for label in ('cold', 'warm'):
+        started = time.perf_counter()
+        scraper.load_term_index(False, interactive=False)
+        results[f'load_term_index {label} ms'] = round(1000 * (time.perf_counter() - started), 2)
+
+    texts = [extract_page(body)[0] for path, (content_type, body) in site.items()
+             if content_type.startswith("text/html") and path != "/"]
+    matcher = scraper.get_phrase_matcher(dei_phrases)
+    reference = None
+    for tokenizer in ('fast', 'nltk'):
+        try:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                counts = [scraper.count_dei_phrases(text, matcher, tokenizer) for text in texts]
+            per_page = (time.perf_counter() - started) / (repeat * len(texts))
+            results[f'identify_dei_phrases[{tokenizer}] ms/page'] = round(1000 * per_page, 3)
+        except LookupError:
+            results[f'identify_dei_phrases[{tokenizer}] ms/page'] = "skipped (NLTK punkt not installed)"
+            continue
+        if reference is None:
+            reference = counts
+        else:
+            results['tokenizers agree'] = counts == reference
+    return results
+
+# Function to measure the memory per URL of each kind of seen-URL set with tracemalloc
+def bench_seen_urls(count=200000):
+    from idDEIA_urls import BloomFilter, FingerprintSet
+
+    # URL strings are made while tracing, so the cost of keeping them (exact) is measured too
+    def make_urls(limit=count):
+        return (f"https://www.example.gov/news/{2000 + index % 25}/article-{index}?page={index % 7}"
+                for index in range(limit))
+    kinds = {'exact': set, 'fingerprint': FingerprintSet,
+             'bloom': lambda: BloomFilter(capacity=count)}
+    results = {}
+    for kind, new_set in kinds.items():
+        tracemalloc.start()
+        seen = new_set()
+        seen.update(make_urls())
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        missing = sum(1 for url in make_urls(1000) if url not in seen)
+        per_url = round(size / count, 1)
+        ceiling = SEEN_URL_CEILINGS.get(kind)
+        status = "" if ceiling is None else (" (ok)" if per_url <= ceiling else f" (OVER the {ceiling} B ceiling)")
+        results[f'seen URLs [{kind}] bytes/URL'] = f"{per_url}{status}" + (" LOST URLS" if missing else "")
+        del seen
+    return results
+
+# Function to check that the sharded crawl found the same totals as the one-page-at-a-time crawl
+def check_sharded_totals(runs):
+    single = next((run for run in runs if run['name'] == 'scraper'), None)
+    sharded = [run for run in runs if run['name'].startswith('sharded')]
+    if single is None or not sharded:
+        return {}
+    results = {}
+    for run in sharded:
+        same = run['totals'] == single['totals'] and not run['error']
+        results[f"{run['name']} totals"] = "same as crawl_website (ok)" if same else "DIFFERENT from crawl_website"
+    return results
+
+# Function to print the benchmark table
+def print_report(config, expected, runs, term_results):
+    print(f"\nSynthetic site: {config}")
+    print(f"Expected totals: {dict((term, expected[term]) for term in PROBE_TERMS)}\n")
+    header = f"{'implementation':<16}{'pages':>7}{'sec':>9}{'pages/s':>9}{'fetch ms':>10}{'parse ms':>10}{'match ms':>10}{'peak MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for run in runs:
+        ms = run['ms_per_page']
+        print(f"{run['name']:<16}{run['pages']:>7}{run['seconds']:>9}{run['pages_per_sec']:>9}"
+              f"{ms.get('fetch', '-'):>10}{ms.get('parse', '-'):>10}{ms.get('match', '-'):>10}{run['peak_rss_mb']:>9}")
+    print("\nTerm totals per implementation:")
+    for run in runs:
+        status = f"  ERROR {run['error']}" if run['error'] else ""
+        print(f"  {run['name']:<16}{run['totals']}{status}")
+    print("\nTerm functions:")
+    for name, value in term_results.items():
+        print(f"  {name:<40}{value}")
+
+# Main function to execute the benchmark
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the DEIA scanners on a synthetic website")
+    parser.add_argument("--pages", type=int, default=200, help="number of HTML pages")
+    parser.add_argument("--fanout", type=int, default=8, help="links per page")
+    parser.add_argument("--words", type=int, default=800, help="words per page")
+    parser.add_argument("--density", type=float, default=0.02, help="share of words that are DEIA terms")
+    parser.add_argument("--binary-share", type=float, default=0.1, help="share of links to binary files")
+    parser.add_argument("--concurrency", default="1,8", help="comma-separated crawl concurrency levels for the scraper")
+    parser.add_argument("--shards", type=int, default=4, help="worker processes for the sharded scraper run (0 to skip it)")
+    parser.add_argument("--impls", default="scraper,gpt4o,grok3", help="implementations to run")
+    parser.add_argument("--seen-urls", type=int, default=200000, help="URLs for the seen-URL memory check")
+    parser.add_argument("--throttle", type=float, help="requests per second the server accepts before it answers 429/503")
+    parser.add_argument("--json", help="also write the measurements to this JSON file")
+    args = parser.parse_args()
+
+    os.environ["NON_INTERACTIVE"] = "1"
+    config = {'pages': args.pages, 'fanout': args.fanout, 'words': args.words,
+              'density': args.density, 'binary_share': args.binary_share}
+    site, expected = generate_site(**config)
+    if args.throttle:
+        config['throttle'] = args.throttle
+    server, base_url = serve_site(site, args.throttle)
+
+    runs = []
+    for name in args.impls.split(","):
+        levels = [int(level) for level in args.concurrency.split(",")] if name == "scraper" else [1]
+        for concurrency in levels:
+            runs.append(bench_implementation(name, base_url, concurrency))
+        if name == "scraper" and args.shards > 0:
+            runs.append(bench_implementation("sharded", base_url, args.shards))
+    term_results = bench_term_functions(site)
+    term_results.update(check_sharded_totals(runs))
+    term_results.update(bench_seen_urls(args.seen_urls))
+    if args.throttle:
+        term_results['server 429/503 responses'] = server.throttled
+    server.shutdown()
+
+    print_report(config, expected, runs, term_results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'config': config, 'expected': dict(expected), 'runs': runs, 'term_functions': term_results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
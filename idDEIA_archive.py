@@ -0,0 +1,176 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Offline input for the scanner: saved copies of the sites instead of live requests, for
+reproducible re-scans with no network access. Two kinds of archives are read:
+  - WARC files (.warc, or .warc.gz with one gzip member per record), as written by
+    wget --warc-file, Heritrix or browsertrix. Uncompressed archives are memory-mapped,
+    so records the scan does not need are skipped without reading them.
+  - Local mirror directories, as written by wget --mirror (one folder per host).
+Both yield (url, content) for the HTML pages they hold, which are then parsed, tokenized
+and matched exactly like fetched pages.
+------------------------------------------------------
+"""
+import gzip
+import mmap
+import os
+import zlib
+from io import BytesIO
+from urllib.parse import quote
+
+from idDEIA_http import HTML_CONTENT_TYPES, looks_binary
+
+# File extensions of the pages in a mirror directory (files without an extension are read if they start with "<")
+MIRROR_PAGE_EXTENSIONS = ('.html', '.htm', '.xhtml', '.shtml', '.php', '.asp', '.aspx', '.jsp')
+
+# Function to read the header lines of a WARC record or an HTTP message until the blank line
+#   returns (first line, {lowercase name: value}); the first line is the WARC version or HTTP status line
+def read_header_lines(stream):
+    first_line = stream.readline()
+    while first_line in (b'\r\n', b'\n'):  # blank lines between records
+        first_line = stream.readline()
+    headers = {}
+    for line in iter(stream.readline, b''):
+        if line in (b'\r\n', b'\n'):
+            break
+        name, _, value = line.partition(b':')
+        headers[name.strip().lower().decode('latin-1')] = value.strip().decode('latin-1')
+    return first_line.strip(), headers
+
+# Function to iterate over the records of an open WARC stream (a file, gzip file or mmap)
+#   yields (WARC headers, block) for the response records; other records are skipped unread
+def iter_warc_stream(stream):
+    while True:
+        version, headers = read_header_lines(stream)
+        if not version:
+            return
+        if not version.startswith(b'WARC/'):
+            raise ValueError(f"Not a WARC record: {version[:40]!r}")
+        length = int(headers.get('content-length', 0))
+        if headers.get('warc-type') != 'response' or not headers.get('warc-target-uri'):
+            stream.seek(length, os.SEEK_CUR)
+            continue
+        yield headers, stream.read(length)
+
+# Function to undo the chunked transfer encoding of an HTTP body stored as it came off the wire
+def dechunk(body):
+    chunks = []
+    position = 0
+    while True:
+        line_end = body.find(b'\r\n', position)
+        if line_end < 0:
+            break
+        size = int(body[position:line_end].split(b';')[0] or b'0', 16)
+        if not size:
+            break
+        chunks.append(body[line_end + 2:line_end + 2 + size])
+        position = line_end + 4 + size
+    return b''.join(chunks)
+
+# Function to undo the Content-Encoding of an HTTP body; returns None for an unsupported one
+def decode_body(body, encoding):
+    if encoding in ('', 'identity'):
+        return body
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompress(body, zlib.MAX_WBITS | 32)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)  # raw deflate, without the zlib header
+    if encoding == 'br':
+        try:
+            import brotli
+        except ImportError:
+            try:
+                import brotlicffi as brotli
+            except ImportError:
+                return None
+        return brotli.decompress(body)
+    return None
+
+# Function to get the HTML page of a WARC response block (status line, headers, body)
+#   returns the page content, or None when the response is not a 200 HTML page
+def html_from_http_response(block):
+    stream = BytesIO(block)
+    status_line, headers = read_header_lines(stream)
+    parts = status_line.split()
+    if len(parts) < 2 or parts[1] != b'200':
+        return None
+    content_type = headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type and content_type not in HTML_CONTENT_TYPES:
+        return None
+
+    body = block[stream.tell():]
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = dechunk(body)
+    try:
+        body = decode_body(body, headers.get('content-encoding', '').strip().lower())
+    except (zlib.error, OSError):
+        return None
+    if body is None or looks_binary(body[:1024]):
+        return None
+    return body
+
+# Function to iterate over the HTML pages in a WARC file: yields (url, content)
+#   .warc.gz files are decompressed as a stream; plain .warc files are memory-mapped
+def iter_warc_pages(path):
+    if path.lower().endswith('.gz'):
+        with gzip.open(path, 'rb') as stream:
+            yield from iter_warc_html(stream)
+        return
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as stream:
+            yield from iter_warc_html(stream)
+
+# Function to iterate over the HTML pages of an open WARC stream: yields (url, content)
+def iter_warc_html(stream):
+    for headers, block in iter_warc_stream(stream):
+        content = html_from_http_response(block)
+        if content is not None:
+            yield headers['warc-target-uri'].strip('<>'), content
+
+# Function to get the URL of a page saved in a mirror directory, from its path below the mirror root
+#   wget --mirror saves https://host/a/b as host/a/b and https://host/a/ as host/a/index.html
+#   base_url -- URL of the mirror root; by default the first folder is the host and the scheme is https
+def mirror_url(relative_path, base_url=None):
+    path = relative_path.replace(os.sep, '/')
+    if path.endswith('/index.html') or path == 'index.html':
+        path = path[:-len('index.html')]
+    if '?' in path:
+        path, _, query = path.partition('?')  # wget keeps the query string in the file name
+        path = quote(path) + '?' + query
+    else:
+        path = quote(path)
+    if base_url:
+        return base_url.rstrip('/') + '/' + path
+    return 'https://' + path
+
+# Function to iterate over the HTML pages in a mirror directory, in a stable order: yields (url, content)
+def iter_mirror_pages(directory, base_url=None):
+    for root, folders, files in os.walk(directory):
+        folders.sort()
+        for name in sorted(files):
+            has_extension = '.' in name.split('?')[0]
+            if has_extension and not name.lower().endswith(MIRROR_PAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                content = f.read()
+            if not has_extension and content.lstrip()[:1] != b'<':
+                continue
+            if content and not looks_binary(content[:1024]):
+                yield mirror_url(os.path.relpath(path, directory), base_url), content
+
+# Function to iterate over the pages of an archive: a WARC file or a mirror directory
+def iter_archive_pages(path, base_url=None):
+    if os.path.isdir(path):
+        return iter_mirror_pages(path, base_url)
+    return iter_warc_pages(path)
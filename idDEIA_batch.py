@@ -0,0 +1,95 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Batch entry point: scans a list of websites (one URL per line, '#' for comments) across
+a pool of worker processes. The DEIA term index is loaded once in the main process and
+handed to every worker; each site's results are appended to one combined JSONL file as
+soon as that site finishes, so a slow site never holds back the others.
+
+    python idDEIA_batch.py sites.txt [results.jsonl]
+------------------------------------------------------
+"""
+from dotenv import load_dotenv
+import os
+import sys
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import idDEIA_scraper as scraper
+
+# Load environment variables from .env file
+load_dotenv()
+
+_dei_phrases = None  # compiled term index of this worker process
+
+# Function to hand the term index to a worker process once, when it starts
+def init_worker(dei_phrases):
+    global _dei_phrases
+    _dei_phrases = dei_phrases
+
+# Function to read the list of sites to scan
+def read_sites(path):
+    with open(path, encoding='utf-8') as f:
+        sites = [line.split('#', 1)[0].strip() for line in f]
+    return [site for site in sites if site]
+
+# Function to scan one site in a worker process; errors are reported, never raised
+def scan_site(url):
+    started = time.time()
+    try:
+        concurrency = int(os.getenv("CONCURRENCY", "1"))
+        if concurrency > 1:
+            max_per_host = int(os.getenv("MAX_PER_HOST", str(concurrency)))
+            totals = scraper.crawl_website_concurrent(url, dei_phrases=_dei_phrases,
+                                                      max_workers=concurrency, max_per_host=max_per_host)
+        else:
+            totals = scraper.crawl_website(url, dei_phrases=_dei_phrases)
+        error = None
+    except Exception as e:
+        totals = {}
+        error = f"{type(e).__name__}: {e}"
+
+    return {
+        'site': url,
+        'combined_counts': scraper.combine_word_counts(totals),
+        'counts': dict(totals),
+        'error': error,
+        'seconds': round(time.time() - started, 2),
+    }
+
+# Function to scan all sites across worker processes, streaming each result to output_path
+def scan_sites(sites, output_path, workers=None, gen_synonyms=True):
+    # Load the term index once; every worker gets this copy
+    _, dei_phrases = scraper.load_term_index(gen_synonyms, interactive=False)
+
+    with open(output_path, 'a', encoding='utf-8') as output, \
+         ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(dei_phrases,)) as executor:
+        futures = [executor.submit(scan_site, site) for site in sites]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            status = f"error: {result['error']}" if result['error'] else result['combined_counts'] or "no DEI-related phrases"
+            print(f"[{done}/{len(sites)}] {result['site']} ({result['seconds']}s) | {status}")
+
+# Main function to execute the batch
+def main():
+    sites_file = sys.argv[1] if len(sys.argv) > 1 else os.getenv("SITES_FILE")
+    if not sites_file:
+        print("Usage: python idDEIA_batch.py sites.txt [results.jsonl]  (or set SITES_FILE)")
+        return
+    output_path = sys.argv[2] if len(sys.argv) > 2 else os.getenv("BATCH_OUTPUT", "deia_batch_results.jsonl")
+    workers = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+    sites = read_sites(sites_file)
+    print(f"Scanning {len(sites)} websites with {workers} worker processes -> {output_path}")
+    scan_sites(sites, output_path, workers)
+
+if __name__ == "__main__":
+    main()
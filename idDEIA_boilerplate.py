@@ -0,0 +1,57 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Cross-page boilerplate detection. Most pages of a site repeat the same header, menu,
+footer and cookie banner; counting the DEI phrases in them on every page inflates the
+totals and wastes tokenize/match time. The text of every page is split into blocks at
+block-level elements and each block is fingerprinted; a block already seen on an
+earlier page of the site is template text and is skipped, so its phrases are counted
+once, on the first page it appears on. No list of tags to exclude is needed.
+------------------------------------------------------
+"""
+import threading
+
+from idDEIA_metrics import metrics
+from idDEIA_urls import FingerprintSet
+
+class BoilerplateFilter:
+    # Fingerprints of the text blocks seen on the pages of one site (shared by the worker threads)
+    def __init__(self):
+        self._seen = FingerprintSet()
+        self._lock = threading.Lock()
+        self.skipped = 0  # repeated blocks skipped so far
+
+    # Function to get the text of a page without the blocks seen on earlier pages
+    #   blocks repeated within the page itself are page content and are all kept
+    def page_text(self, blocks):
+        with self._lock:
+            new_blocks = [block for block in blocks if block not in self._seen]
+            self._seen.update(new_blocks)
+            skipped = len(blocks) - len(new_blocks)
+            self.skipped += skipped
+        if skipped:
+            metrics.add('boilerplate_blocks', skipped)
+        return " ".join(new_blocks)
+
+# The filter of the site being crawled; a process crawls one site at a time
+_site_filter = (None, None)
+_site_lock = threading.Lock()
+
+# Function to start a new boilerplate filter for a crawl of a site (by netloc)
+def start_boilerplate_filter(site):
+    global _site_filter
+    with _site_lock:
+        _site_filter = (site, BoilerplateFilter())
+        return _site_filter[1]
+
+# Function to get the boilerplate filter of a site, starting a new one for a new site
+def get_boilerplate_filter(site):
+    with _site_lock:
+        if _site_filter[0] == site:
+            return _site_filter[1]
+    return start_boilerplate_filter(site)
@@ -0,0 +1,47 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Crawl budgets, so a scheduled scan has a predictable cost. A scan can be limited by
+pages scanned, bytes downloaded and wall time; when any limit is reached the crawler
+stops taking new pages, finishes the ones in flight and returns the partial results.
+------------------------------------------------------
+"""
+import threading
+import time
+
+class CrawlBudget:
+    # Limits of one crawl; None means no limit
+    def __init__(self, max_pages=None, max_bytes=None, max_seconds=None):
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.pages = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Function to count a scanned page
+    def add_page(self):
+        with self._lock:
+            self.pages += 1
+
+    # Function to count downloaded bytes (called from the worker threads)
+    def add_bytes(self, size):
+        with self._lock:
+            self.bytes += size
+
+    # Function to check the budget; returns why it ran out, or None while there is budget left
+    #   in_flight -- pages already being scanned, which count against the page limit
+    def exhausted(self, in_flight=0):
+        if self.max_pages is not None and self.pages + in_flight >= self.max_pages:
+            return f"page limit of {self.max_pages} reached"
+        if self.max_bytes is not None and self.bytes >= self.max_bytes:
+            return f"byte limit of {self.max_bytes} reached"
+        if self.max_seconds is not None and time.monotonic() - self.started >= self.max_seconds:
+            return f"time limit of {self.max_seconds:g}s reached"
+        return None
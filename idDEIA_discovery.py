@@ -0,0 +1,144 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Site discovery before the crawl. robots.txt is read once per site: its Allow/Disallow
+rules filter the crawl frontier and its Crawl-delay paces the requests. The sitemaps it
+lists (or /sitemap.xml) are expanded recursively, through sitemap indexes and gzipped
+sitemaps, and their page URLs seed the frontier, so most pages are known before any
+page is downloaded. Sitemaps are parsed as a stream and never held in memory whole.
+------------------------------------------------------
+"""
+import threading
+import time
+import zlib
+from collections import deque
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+
+import requests
+
+from idDEIA_http import get_session, http_get
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+class SiteRules:
+    # robots.txt rules of one site, plus the pacing its Crawl-delay asks for
+    #   robots -- a parsed RobotFileParser, or None to allow everything
+    def __init__(self, robots=None, user_agent='*'):
+        self.robots = robots
+        self.user_agent = user_agent
+        delay = robots.crawl_delay(user_agent) if robots is not None else None
+        self.crawl_delay = float(delay) if delay else 0.0
+        self.sitemaps = list((robots.site_maps() if robots is not None else None) or [])
+        self._next_request = 0.0
+        self._lock = threading.Lock()
+
+    # Function to check if robots.txt allows the scanner to fetch a URL
+    def allowed(self, url):
+        return self.robots is None or self.robots.can_fetch(self.user_agent, url)
+
+    # Function to wait until the next request is allowed by the Crawl-delay
+    def wait(self):
+        if not self.crawl_delay:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + self.crawl_delay
+        if start > now:
+            time.sleep(start - now)
+
+# Function to read robots.txt of the site of a URL
+#   a missing robots.txt (or any 4xx except 401/403) allows everything, like urllib.robotparser;
+#   401/403 disallow everything; network errors and 5xx are reported and allow everything
+def load_site_rules(url):
+    parts = urlsplit(url)
+    robots_url = f"{parts.scheme}://{parts.netloc}/robots.txt"
+    user_agent = get_session().headers.get('User-Agent', '*')
+
+    robots = RobotFileParser(robots_url)
+    try:
+        response = http_get(robots_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Could not read {robots_url}: {e}")
+        return SiteRules(None, user_agent)
+
+    if response.status_code in (401, 403):
+        robots.disallow_all = True
+        robots.modified()
+    elif 400 <= response.status_code < 500:
+        robots.allow_all = True
+        robots.modified()
+    elif response.ok:
+        robots.parse(response.text.splitlines())
+    else:
+        print(f"Could not read {robots_url}: HTTP {response.status_code}")
+        return SiteRules(None, user_agent)
+    return SiteRules(robots, user_agent)
+
+# Function to stream the body of a sitemap response in chunks, gunzipping .xml.gz files
+#   (a gzip Content-Encoding is already undone by requests)
+def iter_sitemap_chunks(response):
+    decompressor = None
+    for index, chunk in enumerate(response.iter_content(chunk_size=64 * 1024)):
+        if index == 0 and chunk[:2] == GZIP_MAGIC:
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        yield decompressor.decompress(chunk) if decompressor else chunk
+
+# Function to stream the <loc> entries of a sitemap: yields (root tag, URL),
+# where the root tag is "sitemapindex" for an index of sitemaps and "urlset" for pages
+def iter_sitemap_locs(chunks):
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+                continue
+            if event != 'end':
+                continue
+            tag = element.tag.rsplit('}', 1)[-1]  # drop the XML namespace
+            if tag == 'loc' and element.text:
+                yield root.tag.rsplit('}', 1)[-1], element.text.strip()
+            elif tag in ('url', 'sitemap'):
+                root.clear()  # done with this entry; keep memory flat on 50,000-URL sitemaps
+    parser.close()
+
+# Function to expand sitemaps and sitemap indexes into page URLs, breadth first
+#   max_sitemaps -- limit on sitemap files fetched (indexes can list thousands)
+def iter_sitemap_urls(sitemap_urls, max_sitemaps=100):
+    queue = deque(sitemap_urls)
+    fetched = set()
+    while queue and len(fetched) < max_sitemaps:
+        sitemap_url = queue.popleft()
+        if sitemap_url in fetched:
+            continue
+        fetched.add(sitemap_url)
+        try:
+            with http_get(sitemap_url, stream=True) as response:
+                response.raise_for_status()
+                for kind, loc in iter_sitemap_locs(iter_sitemap_chunks(response)):
+                    loc = urljoin(sitemap_url, loc)
+                    if kind == 'sitemapindex':
+                        queue.append(loc)
+                    else:
+                        yield loc
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                print(f"Could not read sitemap {sitemap_url}: {e}")
+        except (requests.exceptions.RequestException, ElementTree.ParseError, zlib.error) as e:
+            print(f"Could not read sitemap {sitemap_url}: {e}")
+
+# Function to get the sitemaps of a site: the ones robots.txt lists, otherwise /sitemap.xml
+def get_sitemap_urls(url, rules):
+    if rules.sitemaps:
+        return rules.sitemaps
+    parts = urlsplit(url)
+    return [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
@@ -0,0 +1,144 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Shared HTTP client layer for the scanner scripts. All page fetches go through one pooled
+keep-alive session, so a same-domain crawl reuses its TCP+TLS connections instead of
+paying a handshake per page. Timeouts, retries with backoff and compression are
+configured here once, from environment variables or a .env file.
+Page bodies are streamed: media, archives and other non-HTML responses are dropped
+after the headers or the first bytes, and pages are capped at MAX_PAGE_BYTES.
+------------------------------------------------------
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Brotli decoding is done by urllib3 when one of these packages is installed
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+_session = None
+_session_lock = threading.Lock()
+_settings = {}
+
+# Function to read the HTTP settings, with defaults, from the environment
+def load_http_settings():
+    return {
+        'connect_timeout': float(os.getenv('HTTP_CONNECT_TIMEOUT', '5')),
+        'read_timeout': float(os.getenv('HTTP_READ_TIMEOUT', '20')),
+        'retries': int(os.getenv('HTTP_RETRIES', '3')),
+        'backoff': float(os.getenv('HTTP_BACKOFF', '0.5')),
+        'pool_size': int(os.getenv('HTTP_POOL_SIZE', os.getenv('CONCURRENCY', '10'))),
+        'user_agent': os.getenv('USER_AGENT', 'DEIA-Compliance-Scanner/1.0'),
+        'max_page_bytes': int(os.getenv('MAX_PAGE_BYTES', str(5 * 1024 * 1024))),
+    }
+
+# Function to build a pooled keep-alive session with retries and compression
+def build_session(settings):
+    retry = Retry(
+        total=settings['retries'],
+        backoff_factor=settings['backoff'],
+        status_forcelist=[500, 502, 504],
+        respect_retry_after_header=False,  # 429/503 go to the crawler's rate limiter (idDEIA_ratelimit)
+        allowed_methods=['GET', 'HEAD'],
+        raise_on_status=False,  # hand the last response back so raise_for_status() reports it
+    )
+    pool_size = max(1, settings['pool_size'])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': settings['user_agent'],
+        'Accept-Encoding': 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+# Function to (re)configure the shared session; settings not given are read from the environment
+def configure_http(**overrides):
+    global _session, _settings
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _settings = {**load_http_settings(), **overrides}
+        _session = build_session(_settings)
+    return _session
+
+# Function to get the shared session, creating it on first use
+def get_session():
+    global _session, _settings
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _settings = load_http_settings()
+                _session = build_session(_settings)
+    return _session
+
+# Function to GET a URL through the shared session with the configured timeouts
+def http_get(url, **kwargs):
+    session = get_session()
+    kwargs.setdefault('timeout', (_settings['connect_timeout'], _settings['read_timeout']))
+    return session.get(url, **kwargs)
+
+# Content types that are parsed as web pages
+HTML_CONTENT_TYPES = {'text/html', 'application/xhtml+xml'}
+
+# Leading bytes of common binary formats (PDF, ZIP/Office, images, audio/video, archives, executables)
+BINARY_SIGNATURES = (b'%PDF', b'PK\x03\x04', b'\x89PNG', b'GIF8', b'\xff\xd8\xff', b'II*\x00', b'MM\x00*',
+                     b'ID3', b'OggS', b'RIFF', b'fLaC', b'\x1aE\xdf\xa3', b'\x1f\x8b', b'Rar!', b'7z\xbc\xaf',
+                     b'BZh', b'\xfd7zXZ', b'\x7fELF', b'\xd0\xcf\x11\xe0', b'wOFF', b'wOF2')
+
+class NotHtmlError(requests.exceptions.RequestException):
+    # The response is not a web page (by Content-Type or by its first bytes)
+    pass
+
+# Function to check the first bytes of a body for a binary file (UTF-16 pages contain NUL bytes too)
+def looks_binary(head):
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return False
+    return head.startswith(BINARY_SIGNATURES) or b'\x00' in head[:1024]
+
+# Function to download a web page: the body is streamed, non-HTML responses are aborted after
+# the headers or the first chunk, and at most max_bytes of the page are read.
+# Returns (response, content); content is b'' for a 304 Not Modified.
+def fetch_html(url, headers=None, max_bytes=None):
+    get_session()  # make sure the settings are loaded
+    if max_bytes is None:
+        max_bytes = _settings['max_page_bytes']
+
+    with http_get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304:
+            return response, b''
+        response.raise_for_status()  # Check if the request was successful
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            raise NotHtmlError(f"Not a web page ({content_type}): {url}", response=response)
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if not chunks and looks_binary(chunk):
+                raise NotHtmlError(f"Binary content: {url}", response=response)
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                break  # page is capped; the rest is never downloaded
+        return response, b''.join(chunks)[:max_bytes]
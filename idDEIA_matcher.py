@@ -0,0 +1,274 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Multi-phrase matcher for the scanner. The DEIA term list is compiled once into an
+Aho-Corasick automaton over word tokens, and every page is then counted in a single
+pass over its token stream. Because it works on whole tokens, "bias" no longer
+matches inside "biasness", while multi-word phrases such as "equal opportunity"
+are still found.
+
+Besides exact matching there are two normalized match modes, "stem" (Porter stemmer)
+and "lemma" (WordNet lemmatizer): the term list and the page tokens are both reduced
+to their stems, so "diversifying" is counted for "diversify". Terms that share a stem are
+reported under one core term, and a one-word term is not counted again inside a longer
+term it is part of. Web text reuses a small vocabulary heavily, so stems are memoized in
+a bounded LRU cache.
+
+For keyword-in-context (KWIC) review, the same pass can also record where each match
+starts in the page text and cut a context window around it, up to a per-page limit.
+------------------------------------------------------
+"""
+import hashlib
+import json
+import re
+from collections import deque
+from functools import lru_cache
+
+# Match modes: "exact" words, Porter "stem"s or WordNet "lemma"s
+MATCH_MODES = ('exact', 'stem', 'lemma')
+
+# Bound on the memoized stems per match mode (distinct words seen on the crawled pages)
+STEM_CACHE_SIZE = 65536
+
+# A word is a run of letters, optionally joined by hyphens (i.e. "bias-free")
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+# Function to check if a token is a word: alphabetic, optionally hyphenated (i.e. "bias-free")
+def is_word_token(token):
+    return token.replace('-', '').isalpha() and token[0] != '-' and token[-1] != '-'
+
+# Function to stream the lowercase word tokens of a text, skipping stop words
+#   Fast alternative to nltk word_tokenize + filtering; yields the same words for matching
+def iter_word_tokens(text, stop_words=()):
+    for match in WORD_PATTERN.finditer(text.lower()):
+        word = match.group()
+        if word not in stop_words:
+            yield word
+
+# Function to stream (word, start, end) for the lowercase word tokens of a text, skipping stop words
+#   start/end are character offsets of the word in the text
+def iter_word_spans(text, stop_words=()):
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group().lower()
+        if word not in stop_words:
+            yield word, match.start(), match.end()
+
+# Function to get the memoized token normalizer of a match mode (None for exact matching)
+#   NLTK's stemmers are imported only when a normalized mode is used
+_normalizers = {}
+def get_normalizer(mode):
+    if mode == 'exact':
+        return None
+    if mode not in _normalizers:
+        if mode == 'stem':
+            from nltk.stem import PorterStemmer
+            reduce_word = PorterStemmer().stem
+        elif mode == 'lemma':
+            from idDEIA_nltk import require_nltk
+            require_nltk('wordnet')
+            from nltk.stem import WordNetLemmatizer
+            lemmatize = WordNetLemmatizer().lemmatize
+            # WordNet lemmatizes one part of speech at a time (nouns by default): use the first of
+            # noun, verb and adjective that reduces the word, so "diversifying" becomes "diversify"
+            def reduce_word(word):
+                for pos in ('n', 'v', 'a'):
+                    lemma = lemmatize(word, pos)
+                    if lemma != word:
+                        return lemma
+                return word
+        else:
+            raise ValueError(f"Unknown match mode {mode!r}; use one of {', '.join(MATCH_MODES)}")
+        _normalizers[mode] = lru_cache(maxsize=STEM_CACHE_SIZE)(reduce_word)
+    return _normalizers[mode]
+
+# Function to turn a DEIA phrase into the token sequence it should match
+#   WordNet lemma names use '_' between words, i.e. "affirmative_action"
+#   Pages are matched without their stop words, so they are dropped from the phrase as well; a phrase
+#   left with a single word of its own ("access for all" -> "access") would count every bare use of
+#   that word, so it gets no tokens and is not matched
+def phrase_to_tokens(phrase, stop_words=(), mode='exact'):
+    words = phrase.lower().replace('_', ' ').split()
+    tokens = tuple(word for word in words if is_word_token(word) and word not in stop_words)
+    if len(tokens) == 1 and len(words) > 1:
+        return ()
+    normalize = get_normalizer(mode)
+    return tuple(normalize(token) for token in tokens) if normalize else tokens
+
+class PhraseMatcher:
+    # Build the automaton: a trie over token sequences plus failure links
+    #   mode       -- "exact", or "stem"/"lemma" to match normalized tokens
+    #   core_terms -- preferred labels for phrases that are merged (see below)
+    # Phrases with the same tokens (i.e. "affirmative action" and "affirmative_action", or with
+    # stemming "diverse" and "diversity") are counted once: under the first of them in core_terms,
+    # otherwise under the first given. In the stem and lemma modes a one-word phrase is not counted
+    # inside a longer phrase match, so "equality" (stem "equal") does not count "equal opportunity".
+    def __init__(self, dei_phrases, stop_words=(), mode='exact', core_terms=()):
+        self.mode = mode
+        self.stop_words = frozenset(stop_words)  # for tokenizing pages the same way as the phrases
+        self.phrases = []       # phrases in the order given, for reporting
+        self._lengths = []      # phrase index -> number of tokens
+        seen = {}               # tokens -> phrase index
+        core_rank = {}          # lowercase core term -> its first position in core_terms
+        for rank, term in enumerate(core_terms):
+            core_rank.setdefault(term.lower(), rank)
+        self._goto = [{}]       # node -> {token: next node}
+        self._fail = [0]
+        self._output = [[]]     # node -> indexes of phrases ending here
+
+        for phrase in dei_phrases:
+            tokens = phrase_to_tokens(phrase, stop_words, mode)
+            if not tokens:
+                continue
+            if tokens in seen:
+                index = seen[tokens]
+                not_core = len(core_rank)
+                if core_rank.get(phrase.lower(), not_core) < core_rank.get(self.phrases[index].lower(), not_core):
+                    self.phrases[index] = phrase
+                continue
+            seen[tokens] = len(self.phrases)
+            node = 0
+            for token in tokens:
+                next_node = self._goto[node].get(token)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][token] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append(len(self.phrases))
+            self.phrases.append(phrase)
+            self._lengths.append(len(tokens))
+
+        # What the matcher counts, under which label: counts saved by another matcher (another term
+        # list, MATCH_MODE or stop words) are not comparable to this one's
+        self.signature = hashlib.sha256(json.dumps(
+            [mode, sorted(self.stop_words), [[self.phrases[index], list(tokens)] for tokens, index in seen.items()]]
+        ).encode('utf-8')).hexdigest()[:16]
+
+        # Breadth-first pass to set failure links and merge suffix outputs (root children fail to root)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+        # For counting longest matches: the one-word phrases ending at each node, and the token count
+        # of the longest phrase ending there if it has more than one word (0 otherwise)
+        self._singles = [tuple(index for index in output if self._lengths[index] == 1) for output in self._output]
+        self._spans = [max((self._lengths[index] for index in output if self._lengths[index] > 1), default=0)
+                       for output in self._output]
+
+    # Function to find the phrases in one pass over the tokens
+    #   yields (phrase index, position of the match's last token); in the stem and lemma modes the
+    #   one-word matches are held back until no longer match can still cover them
+    def iter_matches(self, tokens):
+        normalize = get_normalizer(self.mode)
+        if normalize:
+            tokens = map(normalize, tokens)
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self._lengths
+        longest = normalize is not None
+        horizon = max(lengths, default=1) - 1  # farthest back a longer match can start
+        pending = deque()  # (position, phrase index) of one-word matches not yet known to be alone
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            matches = output[node]
+            if matches and not longest:
+                for index in matches:
+                    yield index, position
+            elif matches:
+                covered_from = position + 1
+                for index in matches:
+                    if lengths[index] > 1:
+                        covered_from = min(covered_from, position - lengths[index] + 1)
+                        yield index, position
+                while pending and pending[-1][0] >= covered_from:
+                    pending.pop()
+                if covered_from > position:
+                    pending.extend((position, index) for index in matches if lengths[index] == 1)
+            while pending and pending[0][0] <= position - horizon:
+                yield pending.popleft()[::-1]
+        while pending:
+            yield pending.popleft()[::-1]
+
+    # Count every phrase in one pass over the tokens; returns a list of counts indexed like self.phrases
+    #   In the stem and lemma modes, a one-word match is taken back when a longer match covers it
+    def count_tokens(self, tokens):
+        normalize = get_normalizer(self.mode)
+        if normalize:
+            tokens = map(normalize, tokens)
+        goto, fail, output = self._goto, self._fail, self._output
+        singles, spans = self._singles, self._spans
+        counts = [0] * len(self.phrases)
+        recent = deque(maxlen=max(self._lengths, default=1))  # (position, indexes) of the latest one-word matches
+        covered = -1  # last position covered by a longer match
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for index in output[node]:
+                counts[index] += 1
+            if normalize is None:
+                continue
+            if singles[node]:
+                recent.append((position, singles[node]))
+            if spans[node]:
+                start = max(position - spans[node] + 1, covered + 1)
+                for single_position, indexes in recent:
+                    if single_position >= start:
+                        for index in indexes:
+                            counts[index] -= 1
+                covered = position
+        return counts
+
+    # Count phrases in the tokens and return {phrase: count} for the ones found
+    def find(self, tokens):
+        counts = self.count_tokens(tokens)
+        return {self.phrases[index]: count for index, count in enumerate(counts) if count}
+
+    # Count phrases like find(), and in the same pass record keyword-in-context snippets
+    #   spans   -- (token, start, end) from iter_word_spans(text)
+    #   context -- characters of text kept on each side of a match
+    #   limit   -- most snippets kept; matches after that are only counted
+    # Returns ({phrase: count}, [{'phrase', 'offset', 'snippet'}]), offset being where the match starts in text
+    def find_in_context(self, spans, text, context=60, limit=20):
+        lengths = self._lengths
+        counts = [0] * len(self.phrases)
+        snippets = []
+        # (start, end) offsets of the latest tokens; a one-word match is held back at most
+        # a phrase length, so the tokens of every match are still in here when it comes
+        recent = deque(maxlen=max(lengths, default=1))
+        read = [0]  # tokens read so far
+        def tokens():
+            for token, start, end in spans:
+                recent.append((start, end))
+                read[0] += 1
+                yield token
+        for index, position in self.iter_matches(tokens()):
+            counts[index] += 1
+            if len(snippets) < limit:
+                last = position - read[0]  # the match's last token, counted from the end of recent
+                offset, end = recent[last - lengths[index] + 1][0], recent[last][1]
+                snippets.append({'phrase': self.phrases[index], 'offset': offset,
+                                 'snippet': text[max(0, offset - context):end + context]})
+        found = {self.phrases[index]: count for index, count in enumerate(counts) if count}
+        return found, snippets
+
+# Function to compile the DEIA phrase list into a matcher
+#   core_terms -- preferred labels when phrases are merged (see PhraseMatcher)
+def compile_dei_phrases(dei_phrases, stop_words=(), mode='exact', core_terms=()):
+    return PhraseMatcher(dei_phrases, stop_words, mode, core_terms)
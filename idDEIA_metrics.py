@@ -0,0 +1,189 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Low-overhead crawl instrumentation: counters, and latency histograms per stage (fetch,
+parse, exclude, tokenize, match), plus bytes fetched, pages skipped and errors by type.
+It is off by default; when off, every call returns right away. When on, it prints a
+progress line every few seconds and writes a metrics file in Prometheus text format
+(.prom) or JSON (any other extension).
+------------------------------------------------------
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+class Histogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[index] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+    # Function to estimate a quantile (i.e. 0.5 for the median) from the buckets
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS, self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound if bound != float('inf') else BUCKETS[-2]
+        return BUCKETS[-2]
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.interval = 10.0
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = Counter()
+        self.errors = Counter()
+        self.skipped = Counter()
+        self.histograms = defaultdict(Histogram)
+        self.started = time.time()
+        self._last_report = self.started
+
+    # Function to turn the instrumentation on or off
+    #   path     -- metrics file, Prometheus text format for .prom, otherwise JSON
+    #   interval -- seconds between progress lines and metrics file updates
+    def configure(self, enabled=False, path=None, interval=10.0):
+        self.enabled = enabled
+        self.path = path
+        self.interval = interval
+        self.reset()
+
+    # Function to start timing a stage; returns None when disabled
+    def start(self):
+        return time.perf_counter() if self.enabled else None
+
+    # Function to record the time of a stage started with start()
+    def observe(self, stage, started):
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.histograms[stage].observe(elapsed)
+
+    # Function to add to a counter (pages, bytes_fetched, ...)
+    def add(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += amount
+
+    # Function to count an error by type, i.e. "ConnectionError" or "HTTPError 404"
+    def error(self, exception):
+        if not self.enabled:
+            return
+        name = type(exception).__name__
+        response = getattr(exception, 'response', None)
+        if response is not None and getattr(response, 'status_code', None):
+            name = f"{name} {response.status_code}"
+        with self._lock:
+            self.errors[name] += 1
+
+    # Function to count a skipped page by reason, i.e. "not_html" or "unchanged"
+    def skip(self, reason):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.skipped[reason] += 1
+
+    # Function to print a progress line and update the metrics file when the interval has passed
+    def tick(self):
+        if not self.enabled:
+            return
+        now = time.time()
+        if now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        print(self.progress_line())
+        self.write()
+
+    # Function to summarize the crawl so far in one line
+    def progress_line(self):
+        elapsed = max(time.time() - self.started, 1e-9)
+        pages = self.counters['pages']
+        stages = " ".join(f"{stage} p50 {1000 * histogram.quantile(0.5):g}ms"
+                          for stage, histogram in sorted(self.histograms.items()))
+        return (f"[metrics] {pages} pages | {pages / elapsed:.1f} pages/s | "
+                f"{self.counters['bytes_fetched'] / 1e6:.1f} MB | {stages} | "
+                f"skipped {sum(self.skipped.values())} | errors {sum(self.errors.values())}")
+
+    # Function to get all metrics as a dict
+    def snapshot(self):
+        with self._lock:
+            return {
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'counters': dict(self.counters),
+                'skipped': dict(self.skipped),
+                'errors': dict(self.errors),
+                'stages': {stage: {'count': histogram.count, 'sum_seconds': round(histogram.sum, 6),
+                                   'p50_seconds': histogram.quantile(0.5), 'p95_seconds': histogram.quantile(0.95),
+                                   'buckets': dict(zip([str(bound) for bound in BUCKETS], histogram.bucket_counts))}
+                           for stage, histogram in self.histograms.items()},
+            }
+
+    # Function to render the metrics in Prometheus text format
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE deia_{name}_total counter")
+                lines.append(f"deia_{name}_total {value}")
+            lines.append("# TYPE deia_pages_skipped_total counter")
+            for reason, value in sorted(self.skipped.items()):
+                lines.append(f'deia_pages_skipped_total{{reason="{reason}"}} {value}')
+            lines.append("# TYPE deia_errors_total counter")
+            for error_type, value in sorted(self.errors.items()):
+                lines.append(f'deia_errors_total{{type="{error_type}"}} {value}')
+            lines.append("# TYPE deia_stage_seconds histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                    lines.append(f'deia_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'deia_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'deia_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    # Function to write the metrics file (atomically, so readers never see half a file).
+    # Only the main process writes it; worker processes (SHARDS, idDEIA_batch) keep their own
+    # counts and leave the file alone.
+    def write(self):
+        if not self.enabled or not self.path or multiprocessing.parent_process() is not None:
+            return
+        if self.path.endswith('.prom'):
+            content = self.prometheus_text()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, self.path)
+
+# The metrics of this process, shared by all modules
+metrics = Metrics()
@@ -0,0 +1,48 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Lazy loading of NLTK and its data. NLTK is imported, and each corpus checked, only when
+a feature first needs it (stop words, WordNet synonyms, the nltk tokenizer, lemmas), so
+importing the scanner stays fast and touches neither the network nor the disk. A corpus
+that is already installed is used as is; a missing one is downloaded once, unless
+NLTK_OFFLINE is set, i.e. on air-gapped machines (point NLTK_DATA at a local copy there).
+------------------------------------------------------
+"""
+import os
+
+# NLTK data packages the scanner uses, and where NLTK keeps them
+NLTK_RESOURCES = {
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'punkt_tab': 'tokenizers/punkt_tab',
+}
+
+_ready = set()  # resources found or downloaded in this process
+
+# Function to check if NLTK may download missing data (NLTK_OFFLINE=1 turns downloads off)
+def is_offline():
+    return os.getenv("NLTK_OFFLINE", "").lower() in ("1", "true", "yes")
+
+# Function to make sure NLTK data packages are installed, downloading missing ones unless offline
+#   returns the nltk module; raises LookupError when a package is missing and cannot be downloaded
+def require_nltk(*names):
+    import nltk
+
+    for name in names:
+        if name in _ready:
+            continue
+        try:
+            nltk.data.find(NLTK_RESOURCES[name])
+        except LookupError:
+            if is_offline():
+                raise LookupError(f"NLTK data '{name}' is not installed and NLTK_OFFLINE is on. Install it with "
+                                  f"'python -m nltk.downloader {name}' or point NLTK_DATA at a local copy.")
+            if not nltk.download(name, quiet=True):
+                raise LookupError(f"NLTK data '{name}' is not installed and could not be downloaded.")
+        _ready.add(name)
+    return nltk
@@ -0,0 +1,186 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+HTML parser backends for the scanner. Each backend takes the raw page and returns its
+visible text and the hrefs of its links, leaving out the sections listed in
+EXCLUDE_SECTIONS (i.e. <footer>).
+    bs4    -- BeautifulSoup tree (the original behaviour)
+    lxml   -- lxml.html tree built in C; much faster on large pages
+    stream -- event-based extractor on html.parser; one pass, no tree at all
+With blocks=True the text comes back split into blocks at block-level elements
+(paragraphs, list items, nav, footer, ...), for the cross-page boilerplate detection.
+------------------------------------------------------
+"""
+from html.parser import HTMLParser
+
+from idDEIA_metrics import metrics
+
+try:
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Tags whose content is never visible text (BeautifulSoup's get_text() skips them too)
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+# Tags that start and end a block of text
+BLOCK_TAGS = frozenset(['address', 'article', 'aside', 'blockquote', 'body', 'dd', 'details', 'div', 'dl', 'dt',
+                        'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+                        'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'summary', 'table',
+                        'td', 'th', 'tr', 'ul', 'br'])
+
+# Function to normalize the whitespace of text parts and join them into one string
+def join_text(parts):
+    return " ".join("".join(parts).split())
+
+# Function to join text parts into blocks; block_starts are the indexes in parts where blocks begin
+def join_blocks(parts, block_starts):
+    bounds = [0] + block_starts + [len(parts)]
+    blocks = (join_text(parts[start:end]) for start, end in zip(bounds, bounds[1:]))
+    return [block for block in blocks if block]
+
+# Function to find the character encoding of a raw page: UTF-8 when it decodes cleanly,
+# otherwise the same detection BeautifulSoup uses
+def detect_encoding(content):
+    try:
+        content.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        from bs4.dammit import UnicodeDammit
+        return UnicodeDammit(content).original_encoding
+
+# Function to parse a page with BeautifulSoup and extract its text (or text blocks) and links
+def extract_with_bs4(content, exclude_sections=(), blocks=False):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Remove specified sections
+    started = metrics.start()
+    for section in exclude_sections:
+        for tag in soup.find_all(section):
+            tag.decompose()
+    metrics.observe('exclude', started)
+
+    if blocks:
+        # strings belong to the block of their nearest block-level ancestor
+        parts, block_starts, current_block = [], [], None
+        for string in soup.strings:
+            block = string.find_parent(BLOCK_TAGS)
+            if block is not current_block and parts:
+                block_starts.append(len(parts))
+            current_block = block
+            parts.append(string)
+        text = join_blocks(parts, block_starts)
+    else:
+        text = " ".join(soup.get_text().split())  # Extract all text from the page
+    hrefs = [link['href'] for link in soup.find_all('a', href=True)]
+    soup.decompose()
+    return text, hrefs
+
+# Function to parse a page with lxml and extract its text (or text blocks) and links
+def extract_with_lxml(content, exclude_sections=(), blocks=False):
+    if not content or not content.strip():
+        return ([] if blocks else ""), []
+    if isinstance(content, bytes):
+        encoding = detect_encoding(content)
+        if encoding != 'utf-8':
+            content = content.decode(encoding or 'utf-8', errors='replace')
+    if isinstance(content, str):
+        # lxml refuses str input with an XML encoding declaration, so hand it UTF-8 bytes
+        content = content.encode('utf-8')
+    root = lxml.html.document_fromstring(content, parser=lxml.html.HTMLParser(encoding='utf-8'))
+
+    # Remove specified sections and non-text content; drop_tree() keeps the tail text
+    started = metrics.start()
+    for element in list(root.iter(*exclude_sections, *NON_TEXT_TAGS, lxml.html.etree.Comment)):
+        if element.getparent() is not None:
+            element.drop_tree()
+    metrics.observe('exclude', started)
+
+    if blocks:
+        parts, block_starts = [], []
+        for event, element in lxml.html.etree.iterwalk(root, events=('start', 'end')):
+            if element.tag in BLOCK_TAGS:
+                block_starts.append(len(parts))
+            if event == 'start':
+                if element.text:
+                    parts.append(element.text)
+            elif element.tail:
+                parts.append(element.tail)
+        text = join_blocks(parts, block_starts)
+    else:
+        text = join_text(root.itertext())
+    hrefs = [link.get('href') for link in root.iter('a') if link.get('href') is not None]
+    return text, hrefs
+
+class StreamingExtractor(HTMLParser):
+    # Collect visible text and anchor hrefs from parser events, skipping excluded subtrees
+    def __init__(self, exclude_sections=()):
+        super().__init__(convert_charrefs=True)
+        self.skip_tags = set(exclude_sections) | NON_TEXT_TAGS
+        self.skip_tag = None    # tag of the excluded subtree we are inside, if any
+        self.skip_depth = 0     # nesting of skip_tag inside that subtree
+        self.text_parts = []
+        self.block_starts = []  # indexes in text_parts where a new block of text begins
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_tag:
+            if tag == self.skip_tag:
+                self.skip_depth += 1
+            return
+        if tag in self.skip_tags:
+            self.skip_tag, self.skip_depth = tag, 1
+            return
+        if tag in BLOCK_TAGS:
+            self.block_starts.append(len(self.text_parts))
+        if tag == 'a':
+            for name, value in attrs:
+                if name == 'href' and value is not None:
+                    self.hrefs.append(value)
+                    break
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags (i.e. <a href="..."/>) open no subtree
+        if not self.skip_tag and tag == 'a':
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self.skip_tag:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+                if not self.skip_depth:
+                    self.skip_tag = None
+        elif tag in BLOCK_TAGS:
+            self.block_starts.append(len(self.text_parts))
+
+    def handle_data(self, data):
+        if not self.skip_tag:
+            self.text_parts.append(data)
+
+# Function to extract text (or text blocks) and links in one streaming pass, without building a tree
+def extract_with_stream(content, exclude_sections=(), blocks=False):
+    if isinstance(content, bytes):
+        content = content.decode(detect_encoding(content) or 'utf-8', errors='replace')
+    extractor = StreamingExtractor(exclude_sections)
+    extractor.feed(content)
+    extractor.close()
+    if blocks:
+        return join_blocks(extractor.text_parts, extractor.block_starts), extractor.hrefs
+    return join_text(extractor.text_parts), extractor.hrefs
+
+# Function to extract (text, hrefs) from a page with the chosen parser backend
+#   falls back to the stream backend when lxml is selected but not installed
+#   blocks -- return the text as a list of blocks instead of one string
+def extract_page(content, parser='lxml', exclude_sections=(), blocks=False):
+    if parser == 'lxml' and LXML_AVAILABLE:
+        return extract_with_lxml(content, exclude_sections, blocks)
+    if parser in ('lxml', 'stream'):
+        return extract_with_stream(content, exclude_sections, blocks)
+    return extract_with_bs4(content, exclude_sections, blocks)
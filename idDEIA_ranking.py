@@ -0,0 +1,176 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Ranked page report. The per-page counts of a crawl are collected into a sparse
+pages x terms count matrix (SciPy CSR), and everything in the report is computed on
+the whole matrix at once: per-page totals, TF-IDF ranking of the pages, the top pages
+for every term and rollups per site section (URL path prefix). The matrix can be built
+while crawling or afterwards from a RESULTS_FILE, without crawling again:
+
+    python idDEIA_ranking.py results.jsonl [top N]
+
+NumPy and SciPy are optional; they are only needed for this report (pip install numpy scipy).
+------------------------------------------------------
+"""
+import csv
+import json
+import sys
+from array import array
+from urllib.parse import urlsplit
+
+try:
+    import numpy as np
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+class TermMatrix:
+    # Collects per-page phrase counts into a sparse pages x terms matrix. It has the write()/close()
+    # interface of ResultsWriter, so the crawlers can fill it page by page.
+    def __init__(self):
+        if not SCIPY_AVAILABLE:
+            raise ImportError("The ranked report needs NumPy and SciPy: pip install numpy scipy")
+        self.urls = []          # row -> page URL
+        self.terms = []         # column -> phrase
+        self._columns = {}      # phrase -> column
+        self._rows = array('i')
+        self._cols = array('i')
+        self._data = array('i')
+        self._matrix = None
+
+    # Function to add one page's PageResult as a row
+    def write(self, result):
+        row = len(self.urls)
+        self.urls.append(result.url)
+        for phrase, count in result.counts.items():
+            column = self._columns.setdefault(phrase, len(self.terms))
+            if column == len(self.terms):
+                self.terms.append(phrase)
+            self._rows.append(row)
+            self._cols.append(column)
+            self._data.append(count)
+        self._matrix = None
+
+    def close(self):
+        pass
+
+    # Function to build the matrix from a results file written by ResultsWriter (.jsonl or .csv)
+    @classmethod
+    def from_results(cls, path):
+        from idDEIA_results import PageResult
+
+        term_matrix = cls()
+        with open(path, encoding='utf-8', newline='') as f:
+            if path.lower().endswith('.csv'):
+                rows = ((row['url'], json.loads(row['counts'])) for row in csv.DictReader(f))
+            else:
+                rows = ((record['url'], record['counts']) for record in map(json.loads, f) if record)
+            for url, counts in rows:
+                term_matrix.write(PageResult(url, counts))
+        return term_matrix
+
+    # Function to get the pages x terms count matrix (CSR), built once
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = sparse.csr_matrix(
+                (np.frombuffer(self._data, dtype=np.int32),
+                 (np.frombuffer(self._rows, dtype=np.int32), np.frombuffer(self._cols, dtype=np.int32))),
+                shape=(len(self.urls), len(self.terms)), dtype=np.int64)
+        return self._matrix
+
+    # Function to get the total count of DEIA phrases on every page (one value per row)
+    def page_totals(self):
+        return np.asarray(self.matrix().sum(axis=1)).ravel()
+
+    # Function to score every page by TF-IDF: sum over its phrases of log(1 + count) * idf,
+    # so phrases found on few pages weigh more than the ones on every page (i.e. in the footer)
+    def tfidf_scores(self):
+        counts = self.matrix()
+        pages = counts.shape[0]
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((1 + pages) / (1 + document_frequency)) + 1
+        weights = counts.astype(np.float64)
+        weights.data = np.log1p(weights.data) * idf[weights.indices]
+        return np.asarray(weights.sum(axis=1)).ravel()
+
+    # Function to rank the pages: returns the top n as [(url, score, total)], best first
+    def ranked_pages(self, n=20):
+        scores = self.tfidf_scores()
+        totals = self.page_totals()
+        order = top_indices(scores, n)
+        return [(self.urls[row], float(scores[row]), int(totals[row])) for row in order if totals[row]]
+
+    # Function to get the top n pages for every phrase: returns {phrase: [(url, count)]}
+    def top_pages_per_term(self, n=5):
+        by_term = self.matrix().tocsc()
+        top = {}
+        for column, phrase in enumerate(self.terms):
+            start, end = by_term.indptr[column], by_term.indptr[column + 1]
+            rows, counts = by_term.indices[start:end], by_term.data[start:end]
+            order = top_indices(counts, n)
+            top[phrase] = [(self.urls[rows[index]], int(counts[index])) for index in order]
+        return top
+
+    # Function to roll the counts up per site section, the first `depth` segments of the URL path
+    # (i.e. /careers for depth 1); returns [(section, pages, total, {phrase: count})], most flagged first
+    def section_rollup(self, depth=1):
+        sections = ['/' + '/'.join([part for part in urlsplit(url).path.split('/') if part][:depth])
+                    for url in self.urls]
+        names, section_of_page = np.unique(np.array(sections, dtype=object), return_inverse=True)
+        # sections x pages indicator matrix; one sparse product sums the pages of every section
+        grouping = sparse.csr_matrix((np.ones(len(self.urls), dtype=np.int64),
+                                      (section_of_page, np.arange(len(self.urls)))),
+                                     shape=(len(names), len(self.urls)))
+        section_counts = (grouping @ self.matrix()).tocsr()
+        pages = np.bincount(section_of_page, minlength=len(names))
+        totals = np.asarray(section_counts.sum(axis=1)).ravel()
+
+        rollup = []
+        for index in np.argsort(-totals, kind='stable'):
+            row = section_counts.getrow(index)
+            counts = {self.terms[column]: int(count) for column, count in zip(row.indices, row.data)}
+            counts = dict(sorted(counts.items(), key=lambda item: -item[1]))
+            rollup.append((names[index], int(pages[index]), int(totals[index]), counts))
+        return rollup
+
+# Function to get the indexes of the n largest values, largest first
+def top_indices(values, n):
+    if len(values) > n:
+        candidates = np.argpartition(-values, n)[:n]
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.argsort(-values[candidates], kind='stable')]
+
+# Function to print the ranked report: top pages, top pages per phrase and section rollups
+def print_ranking_report(term_matrix, top=10, section_depth=1):
+    from idDEIA_results import format_counts
+
+    print(f"\n======\nRanked report: {len(term_matrix.urls)} pages, {len(term_matrix.terms)} DEI-related phrases found")
+    print(f"\nTop {top} pages (TF-IDF score | phrases found):")
+    for url, score, total in term_matrix.ranked_pages(top):
+        print(f"  {score:8.2f} | {total:6} | {url}")
+
+    print("\nTop pages per phrase:")
+    for phrase, pages in sorted(term_matrix.top_pages_per_term(min(top, 5)).items()):
+        print(f"  {phrase}: " + ", ".join(f"{url} ({count})" for url, count in pages))
+
+    print(f"\nSections (first {section_depth} path segment(s)) | pages | phrases found:")
+    for section, pages, total, counts in term_matrix.section_rollup(section_depth)[:top]:
+        print(f"  {section} | {pages} | {total} | {format_counts(dict(list(counts.items())[:5]), ', ')}")
+
+# Main function to rank the pages of a results file
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python idDEIA_ranking.py results.jsonl [top N]")
+        return
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print_ranking_report(TermMatrix.from_results(sys.argv[1]), top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Per-host adaptive rate limiting, so a concurrent crawl gets the most a host will serve
+without being throttled or blocked. Every host has a token bucket. It starts unlimited
+and speeds up again while the host answers quickly; a 429 Too Many Requests or 503
+Service Unavailable halves the rate and pauses the host for its Retry-After, and rising
+latency slows it down before the host starts refusing. A refusal that comes before the rate
+can be measured starts it at one request per pause, doubling every second until the next
+refusal. The robots.txt Crawl-delay is the upper bound. Throttled pages are not lost: the crawlers put them back in the queue.
+------------------------------------------------------
+"""
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+# HTTP statuses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+class ThrottledError(Exception):
+    # A page was refused with 429/503; it should be scanned again later
+    def __init__(self, url, status, delay):
+        super().__init__(f"HTTP {status} (throttled), retry in {delay:.1f}s: {url}")
+        self.url = url
+        self.status = status
+        self.delay = delay
+
+# Function to parse a Retry-After header (seconds, or an HTTP date) into seconds from now; None if absent
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class HostRateLimiter:
+    # Token bucket of one host (one token: requests go out 1/rate apart), with additive increase /
+    # multiplicative decrease of its rate
+    #   max_rate       -- upper bound in requests per second (None: no bound)
+    #   min_rate       -- the rate is never cut below this
+    #   slow_latency   -- a response slower than this, and than 3x the host's usual latency,
+    #                     counts as a sign of overload
+    #   max_retry_wait -- longest Retry-After honored, in seconds
+    def __init__(self, max_rate=None, min_rate=0.1, slow_latency=2.0, max_retry_wait=300.0):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.slow_latency = slow_latency
+        self.max_retry_wait = max_retry_wait
+        self.rate = max_rate         # current requests per second; None is unlimited
+        self.throttled = 0           # 429/503 responses seen
+        self._next_slot = 0.0        # earliest start of the next request at the current rate
+        self._paused_until = 0.0     # Retry-After pause
+        self._consecutive = 0        # 429/503 in a row, for the backoff without Retry-After
+        self._latency = None         # moving average of the response time
+        self._last_slowdown = float('-inf')
+        self._last_increase = time.monotonic()
+        self._slow_start = False     # the rate is a first guess: double it each second until refused
+        self._recent = deque(maxlen=20)  # start times of the latest requests, to measure the actual rate
+        self._lock = threading.Lock()
+
+    # Function to cap the rate by a robots.txt Crawl-delay (seconds between requests)
+    def set_crawl_delay(self, crawl_delay):
+        if crawl_delay:
+            with self._lock:
+                cap = 1.0 / crawl_delay
+                self.max_rate = min(self.max_rate, cap) if self.max_rate else cap
+                self.rate = min(self.rate, self.max_rate) if self.rate else self.max_rate
+
+    # Function to wait until the host may get the next request: every request takes the next free
+    # slot, 1/rate apart, so the requests waiting out a pause do not all go out at once when it ends
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._paused_until)
+            if self.rate is not None:
+                start = max(start, self._next_slot)
+                self._next_slot = start + 1.0 / self.rate
+            self._recent.append(start)
+        if start > now:
+            time.sleep(start - now)
+
+    # Function to get the rate the host was served at over the last 2 seconds, since the last pause
+    # (requests per second), or None when there were too few requests to tell
+    def _observed_rate(self, now):
+        since = max(now - 2.0, self._paused_until)
+        recent = [start for start in self._recent if since <= start <= now]
+        if len(recent) < 5:
+            return None
+        return (len(recent) - 1) / max(recent[-1] - recent[0], 1e-3)
+
+    # Function to cut the rate to a share of what was just being sent (called under the lock);
+    # at most once per second, so a burst of replies to requests already in flight cuts it once
+    def _slow_down(self, now, factor):
+        if now - self._last_slowdown < 1.0:
+            return
+        current = self.rate if self.rate is not None else self._observed_rate(now)
+        if current is None:
+            return  # too few requests yet to tell the rate; throttle() starts from a slow one
+        self.rate = max(self.min_rate, current * factor)
+        self._last_slowdown = self._last_increase = now
+        self._slow_start = False
+
+    # Function to record a successful response and its latency in seconds
+    def success(self, latency):
+        with self._lock:
+            now = time.monotonic()
+            self._consecutive = 0
+            usual = self._latency
+            self._latency = latency if usual is None else 0.8 * usual + 0.2 * latency
+            if usual is not None and latency > self.slow_latency and latency > 3 * usual:
+                self._slow_down(now, 0.8)
+            elif self.rate is not None:
+                # the rate grows by 10% (at least 1 request/s) per second of healthy responses,
+                # or doubles per second in slow start
+                growth = self.rate if self._slow_start else max(0.1 * self.rate, 1.0)
+                self.rate += growth * min(now - self._last_increase, 1.0)
+                self._last_increase = now
+                if self.max_rate is not None:
+                    self.rate = min(self.rate, self.max_rate)
+
+    # Function to record a 429/503: halves the rate and pauses the host for Retry-After
+    # (or an exponential backoff when there is none); returns the pause in seconds
+    def throttle(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if now >= self._paused_until:  # refusals of requests sent during the pause do not count twice
+                self._consecutive += 1
+            self._slow_down(now, 0.5)
+            if retry_after is None:
+                retry_after = min(60.0, 0.5 * 2 ** (self._consecutive - 1))
+            delay = min(retry_after, self.max_retry_wait)
+            self._paused_until = max(self._paused_until, now + delay)
+            if self.rate is None:
+                # still unlimited with no rate to halve: one request per pause (at least one a second),
+                # so the requests waiting out the pause go out spaced, then slow start from there
+                self.rate = max(self.min_rate, 1.0 / max(delay, 1.0))
+                self._last_slowdown = self._last_increase = now
+                self._slow_start = True
+            return delay
+
+class RateLimiters:
+    # The limiters of all hosts, created on first use
+    def __init__(self):
+        self.max_rate = None
+        self.max_retry_wait = 300.0
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    # Function to set the options of the limiters created from now on
+    def configure(self, max_rate=None, max_retry_wait=300.0):
+        self.max_rate = max_rate
+        self.max_retry_wait = max_retry_wait
+
+    # Function to get the limiter of a host (netloc)
+    def get(self, host):
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = HostRateLimiter(self.max_rate, max_retry_wait=self.max_retry_wait)
+            return limiter
+
+# The process-wide limiters, configured by idDEIA_scraper
+rate_limiters = RateLimiters()
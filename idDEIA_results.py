@@ -0,0 +1,87 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Structured scan results. Each scanned page becomes one PageResult record with integer
+counts per DEIA phrase, plus its keyword-in-context snippets in KWIC mode; a ResultsWriter
+appends the records to a JSONL or CSV file while the crawl runs, so nothing per page needs
+to stay in memory. Totals are summed from the integer counts.
+------------------------------------------------------
+"""
+import csv
+import json
+import os
+from collections import Counter, namedtuple
+
+# One scanned page: its URL, {phrase: count} for the DEIA phrases found on it and, in KWIC mode,
+# its snippets as [{'phrase', 'offset', 'snippet'}] (None otherwise)
+PageResult = namedtuple('PageResult', ['url', 'counts', 'snippets'], defaults=(None,))
+
+# Function to format phrase counts like the scanner prints them: "equity (3); equal opportunity (1)"
+def format_counts(counts, separator="; "):
+    return separator.join(f"{phrase} ({count})" for phrase, count in counts.items())
+
+class ResultsWriter:
+    # Open a results file; the format follows the extension (.csv, otherwise JSONL).
+    # Rows are appended, so a resumed scan keeps adding to the same file; a CSV whose columns
+    # differ (snippets or not) raises ValueError instead of getting rows that do not fit.
+    #   snippets -- add a snippets column to the CSV (JSONL rows get one whenever a page has snippets)
+    def __init__(self, path, flush_every=50, snippets=False):
+        self.path = path
+        self.format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        self.flush_every = flush_every
+        self.snippets = snippets
+        self.totals = Counter()
+        self.pages = 0
+        header = ['url', 'total', 'counts'] + (['snippets'] if snippets else [])
+        if self.format == 'csv' and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, encoding='utf-8', newline='') as f:
+                existing = next(csv.reader(f), [])
+            if existing != header:
+                raise ValueError(f"Results file {path} has the columns {', '.join(existing)}, not {', '.join(header)}. "
+                                 "Scan with KWIC set as before, or use another RESULTS_FILE.")
+        self._file = open(path, 'a', encoding='utf-8', newline='')
+        if self.format == 'csv':
+            self._csv = csv.writer(self._file)
+            if self._file.tell() == 0:
+                self._csv.writerow(header)
+
+    # Function to append one page's result
+    def write(self, result):
+        total = sum(result.counts.values())
+        if self.format == 'csv':
+            # counts stay a JSON object, so multi-word and hyphenated phrases survive intact
+            row = [result.url, total, json.dumps(result.counts)]
+            if self.snippets:
+                row.append(json.dumps(result.snippets or []))
+            self._csv.writerow(row)
+        else:
+            record = {'url': result.url, 'total': total, 'counts': result.counts}
+            if result.snippets is not None:
+                record['snippets'] = result.snippets
+            self._file.write(json.dumps(record) + "\n")
+
+        self.totals.update(result.counts)
+        self.pages += 1
+        if self.pages % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ResultsTee:
+    # Hands every page's result to several writers (i.e. a ResultsWriter and a ranking TermMatrix)
+    def __init__(self, writers):
+        self.writers = writers
+
+    def write(self, result):
+        for writer in self.writers:
+            writer.write(result)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
@@ -14,40 +14,186 @@ similar to other open-source software. Contributions and feedback are welcome.
 from dotenv import load_dotenv
 import os
 import ast
+import hashlib
+import json
+import pickle
+import time
 
 import requests
-from bs4 import BeautifulSoup
 
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords, wordnet
+from idDEIA_http import NotHtmlError, fetch_html
+from idDEIA_discovery import SiteRules, get_sitemap_urls, iter_sitemap_urls, load_site_rules
+from idDEIA_metrics import metrics
+from idDEIA_parser import extract_page
+from idDEIA_state import CrawlState, ScanHistory, ShardStore
+from idDEIA_results import PageResult, ResultsTee, ResultsWriter, format_counts
+from idDEIA_urls import BloomFilter, FingerprintSet, UrlFrontier, canonicalize_url, compile_ignore_rules, parse_priorities
+from idDEIA_budget import CrawlBudget
+from idDEIA_ratelimit import THROTTLE_STATUSES, ThrottledError, parse_retry_after, rate_limiters
+from idDEIA_archive import iter_archive_pages
+from idDEIA_boilerplate import get_boilerplate_filter, start_boilerplate_filter
+from idDEIA_matcher import PhraseMatcher, compile_dei_phrases, is_word_token, iter_word_spans, iter_word_tokens
+from idDEIA_nltk import require_nltk
 
 import urllib.parse
 from urllib.parse import urlparse
 
 import re
-from collections import defaultdict
-
-# NLTK resources
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('wordnet') #Synonym
-nltk.download('punkt_tab')
+from collections import Counter, defaultdict
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED, FIRST_EXCEPTION
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Set NON_INTERACTIVE=1 to run unattended (no prompts), i.e. in batch jobs
+INTERACTIVE = os.getenv("NON_INTERACTIVE", "").lower() not in ("1", "true", "yes")
+
+# Folder for the compiled term index cache
+TERM_INDEX_CACHE = os.getenv("TERM_INDEX_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "deia-scanner"))
+TERM_INDEX_FORMAT = 7  # bump when the cached structures change
+
+# URL canonicalization rules: query parameters to ignore (comma-separated, '*' for a prefix)
+# and whether "/about/" and "/about" are the same page (off by default: with it on, a link to "/about/"
+# is requested as "/about", a redirect more for every such page)
+URL_IGNORE_RULES = compile_ignore_rules(os.getenv("IGNORE_QUERY_PARAMS"))
+STRIP_TRAILING_SLASH = os.getenv("STRIP_TRAILING_SLASH", "0").lower() in ("1", "true", "yes")
+
+# Function to canonicalize a URL with the configured rules (see idDEIA_urls.canonicalize_url)
+def canonical_url(url):
+    return canonicalize_url(url, URL_IGNORE_RULES, STRIP_TRAILING_SLASH)
+
+# HTML parser backend: "lxml" (C tree, default), "stream" (one pass, no tree) or "bs4" (BeautifulSoup tree)
+HTML_PARSER = os.getenv("HTML_PARSER", "lxml").lower()
+
+# Tokenizer backend: "fast" (compiled regex, streaming) or "nltk" (word_tokenize)
+TOKENIZER = os.getenv("TOKENIZER", "fast").lower()
+
+# Discovery before the crawl: ROBOTS_TXT=1 follows robots.txt (Allow/Disallow and Crawl-delay),
+# SITEMAPS=1 seeds the crawl with up to SITEMAP_LIMIT pages from the site's sitemaps
+ROBOTS_TXT = os.getenv("ROBOTS_TXT", "1").lower() in ("1", "true", "yes")
+SITEMAPS = os.getenv("SITEMAPS", "1").lower() in ("1", "true", "yes")
+SITEMAP_LIMIT = int(os.getenv("SITEMAP_LIMIT", "50000"))
+
+# Crawl order and limits: CRAWL_ORDER is "dfs", "bfs" or "priority" (pages whose path contains an earlier
+# CRAWL_PRIORITY pattern first); MAX_DEPTH limits the link depth, MAX_PAGES/MAX_BYTES/MAX_SECONDS the cost
+CRAWL_PRIORITY = parse_priorities(os.getenv("CRAWL_PRIORITY"))
+CRAWL_ORDER = os.getenv("CRAWL_ORDER", "priority" if CRAWL_PRIORITY else "dfs").lower()
+MAX_DEPTH = int(os.getenv("MAX_DEPTH")) if os.getenv("MAX_DEPTH") else None
+MAX_PAGES = int(os.getenv("MAX_PAGES")) if os.getenv("MAX_PAGES") else None
+MAX_BYTES = int(os.getenv("MAX_BYTES")) if os.getenv("MAX_BYTES") else None
+MAX_SECONDS = float(os.getenv("MAX_SECONDS")) if os.getenv("MAX_SECONDS") else None
+
+# Function to get a crawl budget with the configured limits (no limits by default)
+def get_crawl_budget():
+    return CrawlBudget(MAX_PAGES, MAX_BYTES, MAX_SECONDS)
+
+# How the crawl remembers the URLs it has seen: "exact" (set of URL strings), "fingerprint"
+# (64-bit hashes, ~16 bytes per URL) or "bloom" (Bloom filter sized for BLOOM_CAPACITY URLs,
+# ~1.8 bytes per URL at the default BLOOM_ERROR_RATE; a false positive skips a page)
+SEEN_URLS = os.getenv("SEEN_URLS", "exact").lower()
+BLOOM_CAPACITY = int(os.getenv("BLOOM_CAPACITY", "1000000"))
+BLOOM_ERROR_RATE = float(os.getenv("BLOOM_ERROR_RATE", "0.001"))
+
+# Function to get an empty set of seen URLs of the configured kind
+def new_seen_set():
+    if SEEN_URLS == "fingerprint":
+        return FingerprintSet()
+    if SEEN_URLS == "bloom":
+        return BloomFilter(capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE)
+    return set()
+
+# Function to get an empty crawl frontier with the configured order, depth limit and priorities
+#   seen_set -- set-like object for the URLs already seen (see new_seen_set); default: a set
+def new_frontier(seen_set=None):
+    return UrlFrontier(order=CRAWL_ORDER, max_depth=MAX_DEPTH, priorities=CRAWL_PRIORITY, seen_set=seen_set)
+
+# Per-host rate limiting: hosts are paced adaptively and 429/503 responses are retried later, at most
+# THROTTLE_RETRIES times per page; HOST_MAX_RATE caps the requests per second to any one host
+rate_limiters.configure(max_rate=float(os.getenv("HOST_MAX_RATE")) if os.getenv("HOST_MAX_RATE") else None,
+                        max_retry_wait=float(os.getenv("RETRY_AFTER_LIMIT", "300")))
+THROTTLE_RETRIES = int(os.getenv("THROTTLE_RETRIES", "5"))
+
+# Match mode: "exact" words, or "stem"/"lemma" to also count other word forms (i.e. "diversifying")
+MATCH_MODE = os.getenv("MATCH_MODE", "exact").lower()
+
+# Crawl metrics, off by default: METRICS=1 prints a progress line every METRICS_INTERVAL seconds;
+# METRICS_FILE also writes them to a file (.prom for Prometheus text format, otherwise JSON)
+METRICS_FILE = os.getenv("METRICS_FILE")
+metrics.configure(enabled=bool(METRICS_FILE) or os.getenv("METRICS", "").lower() in ("1", "true", "yes"),
+                  path=METRICS_FILE, interval=float(os.getenv("METRICS_INTERVAL", "10")))
+
+# Keyword-in-context snippets, off by default: KWIC=1 keeps up to KWIC_LIMIT matches per page with
+# KWIC_CONTEXT characters of text on each side, and writes them to the RESULTS_FILE
+KWIC = os.getenv("KWIC", "").lower() in ("1", "true", "yes")
+KWIC_CONTEXT = int(os.getenv("KWIC_CONTEXT", "60"))
+KWIC_LIMIT = int(os.getenv("KWIC_LIMIT", "20"))
+
+# Function to get the English stop words, loaded from NLTK only once per process
+_stop_words = None
+def get_stop_words():
+    global _stop_words
+    if _stop_words is None:
+        require_nltk('stopwords')
+        from nltk.corpus import stopwords
+        _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
+# Sections to exclude (i.e. ['footer', 'nav']) from .env file, parsed once at startup
+EXCLUDE_SECTIONS = tuple(ast.literal_eval(os.getenv('EXCLUDE_SECTIONS')) if os.getenv('EXCLUDE_SECTIONS') else ())
+
+# Cross-page boilerplate detection, off by default: BOILERPLATE=1 counts text blocks repeated
+# across the pages of a site (header, menu, footer, ...) only once, on the first page they appear on
+BOILERPLATE = os.getenv("BOILERPLATE", "").lower() in ("1", "true", "yes")
+
+# Function to check that BOILERPLATE is not combined with a crawl mode it cannot count right;
+# raises ValueError for them
+#   shards  -- with several worker processes, each would keep its own blocks and count the shared
+#              text once per worker
+#   history -- with a ScanHistory, a page answering 304 Not Modified adds no blocks, so the next
+#              page takes in the template text, gets a new text hash and is reported as changed
+def check_boilerplate_mode(shards=1, history=None):
+    if not BOILERPLATE:
+        return
+    if shards > 1:
+        raise ValueError("BOILERPLATE cannot be combined with SHARDS: every worker process would count the "
+                         "repeated text again. Use CONCURRENCY instead.")
+    if history is not None:
+        raise ValueError("BOILERPLATE cannot be combined with SCAN_HISTORY: pages not scanned again "
+                         "would leave their repeated text to be counted on other pages.")
+
+# Function to check that SHARDS is not combined with crawl settings the worker processes do not
+# follow; raises ValueError for them. The workers scan each shard's queue in the order its pages
+# were found and stop when the whole site is scanned, with no shared budget, saved crawl state or
+# scan history.
+#   state   -- CRAWL_STATE path, if set (SHARD_STORE keeps the progress of a sharded scan)
+#   history -- SCAN_HISTORY path, if set
+def check_sharded_mode(shards=1, state=None, history=None):
+    if shards <= 1:
+        return
+    ignored = [name for name, value in (("MAX_PAGES", MAX_PAGES), ("MAX_BYTES", MAX_BYTES),
+                                        ("MAX_SECONDS", MAX_SECONDS), ("CRAWL_ORDER", os.getenv("CRAWL_ORDER")),
+                                        ("CRAWL_PRIORITY", CRAWL_PRIORITY), ("CRAWL_STATE", state),
+                                        ("SCAN_HISTORY", history)) if value]
+    if ignored:
+        raise ValueError(f"SHARDS cannot be combined with {', '.join(ignored)}: the worker processes ignore "
+                         "those settings. Use CONCURRENCY instead (SHARD_STORE keeps the progress of a sharded scan).")
+
+# Function to get the sections to exclude from the page text
+def get_exclude_sections():
+    return EXCLUDE_SECTIONS
+
 # Fetch and parse the website content
 def fetch_website_content(url):
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Check if the request was successful
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # pooled keep-alive session; non-HTML bodies are aborted early and pages are size-capped
+        response, content = fetch_html(url)
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(content, 'html.parser')
 
         # Load sections to exclude from .env file
-        exclude_sections_str = os.getenv('EXCLUDE_SECTIONS')
-        if exclude_sections_str:
-            exclude_sections = ast.literal_eval(exclude_sections_str)
+        exclude_sections = get_exclude_sections()
+        if exclude_sections:
             # Remove specified sections
             for section in exclude_sections:
                 for tag in soup.find_all(section):
@@ -65,29 +211,132 @@ def fetch_website_content(url):
         ## print(f"Error fetching website content: {e}")
         return "", None
 
-# Function to identify key phrases related to DEI in the content, including synonyms
-def identify_dei_phrases(text, dei_phrases):
-    # Tokenize the text
-    tokens = word_tokenize(text.lower())  # Convert to lower case
-    stop_words = set(stopwords.words('english'))  # Define stop words
-    filtered_tokens = [word for word in tokens if word.isalpha() and word not in stop_words]
+# Function to fetch a page with fetch_html, counting bytes, skipped pages and errors in the metrics
+#   the request waits for the host's rate limiter; a 429/503 slows the host down and raises
+#   ThrottledError, so the crawler can queue the page again instead of losing it
+#   returns (response, content), or (None, b'') when the page could not be fetched or is not HTML
+#   budget -- optional CrawlBudget; the downloaded bytes are counted against it
+def fetch_counted(url, headers=None, budget=None):
+    limiter = rate_limiters.get(urlparse(url).netloc)
+    limiter.acquire()
+    started = metrics.start()
+    requested = time.monotonic()
+    try:
+        # pooled keep-alive session; non-HTML bodies are aborted early and pages are size-capped
+        response, content = fetch_html(url, headers=headers)
+    except NotHtmlError:
+        metrics.skip('not_html')
+        return None, b''
+    except requests.exceptions.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status in THROTTLE_STATUSES:
+            delay = limiter.throttle(parse_retry_after(e.response.headers.get('Retry-After')))
+            metrics.add('throttled')
+            raise ThrottledError(url, status, delay)
+        metrics.error(e)
+        return None, b''
+    except requests.exceptions.RequestException as e:
+        ## print(f"Error fetching website content: {e}")
+        metrics.error(e)
+        return None, b''
+    finally:
+        metrics.observe('fetch', started)
+    limiter.success(time.monotonic() - requested)
+    metrics.add('bytes_fetched', len(content))
+    if budget is not None:
+        budget.add_bytes(len(content))
+    return response, content
+
+# Function to extract (text, hrefs) from a fetched page with the configured parser backend
+#   site -- netloc of the site being crawled; with BOILERPLATE on, the text blocks already seen
+#           on its other pages are left out of the text
+def parse_page(content, parser=None, site=None):
+    started = metrics.start()
+    try:
+        if not BOILERPLATE or site is None:
+            return extract_page(content, parser or HTML_PARSER, EXCLUDE_SECTIONS)
+        blocks, hrefs = extract_page(content, parser or HTML_PARSER, EXCLUDE_SECTIONS, blocks=True)
+        return get_boilerplate_filter(site).page_text(blocks), hrefs
+    finally:
+        metrics.observe('parse', started)
 
-    # Find matching phrases
-    found_phrases = []
+# Fetch the website content and extract its text and link hrefs with the configured parser backend
+#   lighter than fetch_website_content: the stream and lxml backends never build a soup
+#   returns (text, hrefs, page URL); the page URL is the one fetched after any redirects, which
+#   is what the relative hrefs are resolved against
+def fetch_page(url, parser=None, budget=None, site=None):
+    response, content = fetch_counted(url, budget=budget)
+    if response is None:
+        return "", [], url
+    text, hrefs = parse_page(content, parser, site)
+    return text, hrefs, response.url or url
 
-    for phrase in dei_phrases:
+# Function to get the compiled matcher for a DEIA phrase list, building it only once per list
+_phrase_matchers = {}
+def get_phrase_matcher(dei_phrases):
+    if isinstance(dei_phrases, PhraseMatcher):
+        return dei_phrases
+    key = tuple(dei_phrases)
+    if key not in _phrase_matchers:
+        _phrase_matchers[key] = compile_dei_phrases(dei_phrases, get_stop_words(), MATCH_MODE,
+                                                    get_core_deia_terms(in_list_order=True))
+    return _phrase_matchers[key]
 
-        if phrase in ' '.join(filtered_tokens):
+# Function to tokenize page text into lowercase words with stop words removed
+#   tokenizer  -- "fast" streams words with a compiled regex, "nltk" uses word_tokenize
+#   stop_words -- the stop words to drop (default: NLTK's English stop words)
+def tokenize_text(text, tokenizer=None, stop_words=None):
+    if stop_words is None:
+        stop_words = get_stop_words()
+    if (tokenizer or TOKENIZER) == "nltk":
+        require_nltk('punkt_tab')
+        from nltk.tokenize import word_tokenize
+        tokens = word_tokenize(text.lower())  # Convert to lower case
+        return [word for word in tokens if is_word_token(word) and word not in stop_words]
+    return iter_word_tokens(text, stop_words)
+
+# Function to count the DEI phrases in the content: returns {phrase: count} for the phrases found
+#   dei_phrases can be the list from get_dei_phrases() or a matcher from get_phrase_matcher()
+def count_dei_phrases(text, dei_phrases, tokenizer=None):
+    matcher = get_phrase_matcher(dei_phrases)
+    # the matcher carries its stop words, so a worker handed a compiled matcher never loads NLTK
+    filtered_tokens = tokenize_text(text, tokenizer, matcher.stop_words)
+
+    if metrics.enabled:
+        # The fast tokenizer is lazy; materialize the tokens so tokenize and match are timed apart
+        started = metrics.start()
+        filtered_tokens = list(filtered_tokens)
+        metrics.observe('tokenize', started)
+
+    # Find matching phrases -- every phrase is counted in one pass over the tokens, whole words only
+    started = metrics.start()
+    counts = matcher.find(filtered_tokens)
+    metrics.observe('match', started)
+    return counts
+
+# Function to count the DEI phrases in the content and, in the same pass, cut a keyword-in-context
+# snippet around each match; returns ({phrase: count}, [{'phrase', 'offset', 'snippet'}])
+#   offsets are character offsets in the page text; words are always split by the fast tokenizer here
+def count_dei_phrases_in_context(text, dei_phrases, context=None, limit=None):
+    matcher = get_phrase_matcher(dei_phrases)
+    started = metrics.start()
+    counts, snippets = matcher.find_in_context(iter_word_spans(text, matcher.stop_words), text,
+                                               KWIC_CONTEXT if context is None else context,
+                                               KWIC_LIMIT if limit is None else limit)
+    metrics.observe('match', started)
+    return counts, snippets
+
+# Function to identify key phrases related to DEI in the content, including synonyms
+#   returns them as display strings, i.e. ["equity (3)", "equal opportunity (1)"]
+def identify_dei_phrases(text, dei_phrases, tokenizer=None):
+    found_phrases = [phrase + " (" + str(count) + ")" for phrase, count in count_dei_phrases(text, dei_phrases, tokenizer).items()]
 
-            count = ' '.join(filtered_tokens).count(phrase)
-            #print (f"DEI-related phrase found: {phrase} | Count: {count}")
-            
-            found_phrases.append(phrase + " (" + str(count) + ")")
-    
     return found_phrases
 
-# Function with the option to get synonyms for DEI-related terms from WordNet
-def get_dei_phrases(gen_synonyms=False):
+# Function to get the core DEIA terms, before any synonym expansion
+#   in_list_order -- keep them in the order listed below, each family led by its head term
+#                    (i.e. "diversity"), instead of sorting them
+def get_core_deia_terms(in_list_order=False):
 
     # Top DEIA terms and their variations
     core_deia_terms = [
@@ -119,12 +368,20 @@ def get_dei_phrases(gen_synonyms=False):
         "Access for all"
     ]
 
-    deia_terms = sorted(list(set(term.lower() for term in core_deia_terms)))  # Remove duplicates and sort;
+    core_deia_terms = list(dict.fromkeys(term.lower() for term in core_deia_terms))  # Remove duplicates
+    return core_deia_terms if in_list_order else sorted(core_deia_terms)
+
+# Function with the option to get synonyms for DEI-related terms from WordNet
+def get_dei_phrases(gen_synonyms=False, interactive=None):
+
+    deia_terms = get_core_deia_terms()
 
     if gen_synonyms:    
         dei_wordphrases = set(deia_terms)  # Start with the core terms
 
         # Get synonyms for each DEI term using WordNet
+        require_nltk('wordnet')
+        from nltk.corpus import wordnet
         for term in deia_terms:
             for syn in wordnet.synsets(term):
                 for lemma in syn.lemmas():
@@ -133,64 +390,514 @@ def get_dei_phrases(gen_synonyms=False):
         #dei_wordphrases = [word.lower() for word in deia_terms]
         dei_wordphrases = deia_terms
 
+    dei_wordphrases = sorted(dei_wordphrases)
+    review_dei_phrases(dei_wordphrases, gen_synonyms, interactive)
+
+    return dei_wordphrases
+
+# Function to show the DEIA terms and wait for the user, unless running unattended
+def review_dei_phrases(dei_wordphrases, gen_synonyms, interactive=None):
+    if interactive is None:
+        interactive = INTERACTIVE
+    if not interactive:
+        print(f"Using {len(dei_wordphrases)} DEIA terms (gen_synonyms is {gen_synonyms})")
+        return
+
     print (f"\n List of defined DEIA terms gen_synonyms is {gen_synonyms}: \n{dei_wordphrases} \n")
     input("Max Tsai: Enter to continue...")
     print ("\n*********************************\n")
 
-    return list(dei_wordphrases)
+# Function to get the installed WordNet version from its data file header, without loading the corpus
+def get_wordnet_version():
+    try:
+        pointer = require_nltk('wordnet').data.find('corpora/wordnet')
+        with pointer.join('data.adj').open(encoding='utf8') as data_file:
+            for line_number, line in enumerate(data_file):
+                match = re.search(r"Word[nN]et (\d+|\d+\.\d+) Copyright", line)
+                if match:
+                    return match.group(1)
+                if line_number > 50:
+                    break
+    except (LookupError, OSError):
+        return "missing"
+    return "unknown"
+
+# Function to load the compiled term index (expanded phrases + matcher) from the on-disk cache,
+# building and storing it on the first run. The cache is keyed by the term list, the stop words
+# and the WordNet version, so changing any of them rebuilds the index.
+def load_term_index(gen_synonyms=False, interactive=None):
+    stop_words = get_stop_words()
+    key_source = json.dumps({
+        'format': TERM_INDEX_FORMAT,
+        'terms': get_core_deia_terms(),
+        'gen_synonyms': gen_synonyms,
+        'match_mode': MATCH_MODE,
+        'wordnet': get_wordnet_version() if gen_synonyms else None,
+        'stop_words': sorted(stop_words),
+    })
+    key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()[:16]
+    cache_file = os.path.join(TERM_INDEX_CACHE, f"term_index-{key}.pickle")
+
+    try:
+        with open(cache_file, 'rb') as f:
+            term_index = pickle.load(f)
+        review_dei_phrases(term_index['phrases'], gen_synonyms, interactive)
+        return term_index['phrases'], term_index['matcher']
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+        pass  # no usable cache yet -- build it below
+
+    dei_phrases = get_dei_phrases(gen_synonyms, interactive)
+    matcher = compile_dei_phrases(dei_phrases, stop_words, MATCH_MODE,
+                                  get_core_deia_terms(in_list_order=True))
+    _phrase_matchers[tuple(dei_phrases)] = matcher
+
+    try:
+        os.makedirs(TERM_INDEX_CACHE, exist_ok=True)
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'wb') as f:
+            pickle.dump({'phrases': dei_phrases, 'matcher': matcher}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, cache_file)  # atomic, so parallel runs never read half a file
+    except OSError as e:
+        print(f"Could not write term index cache {cache_file}: {e}")
+
+    return dei_phrases, matcher
+
+# Undesirable file types (PDFs, videos, JavaScript, CSS, ...), by file extension without the dot.
+# This is only a cheap first filter: responses that turn out not to be HTML are dropped by fetch_html.
+UNDESIRABLE_EXTENSIONS = frozenset(['pdf', 'mp4', 'mov', 'avi', 'js', 'css', 'jpeg', 'jpg', 'png', 'gif', 'webm', 'xml', 'json', 'ppt', 'pptx', 'doc', 'docx', 'xls', 'xlsx', 'csv', 'zip', 'rar', 'tar', 'gz', '7z', 'exe', 'bin', 'dmg', 'iso', 'apk', 'deb', 'rpm', 'torrent', 'woff', 'woff2', 'ttf', 'otf', 'eot', 'svg', 'ico', 'mp3', 'wav', 'flac', 'ogg', 'wma', 'aac', 'm4a', 'opus', 'mid', 'midi', 'kar', 'webp', 'bmp', 'tiff', 'tif', 'eps', 'svgz', '3gp', '3g2', 'mkv', 'flv', 'vob', 'ogv', 'drc', 'gifv', 'mng', 'qt', 'wmv', 'yuv', 'rm', 'rmvb', 'asf', 'amv', 'mpg', 'mp2', 'mpeg', 'mpe', 'mpv', 'm2v', 'm4v', 'svi', 'mxf', 'roq', 'nsv', 'f4v', 'f4p', 'f4a', 'f4b'])
 
 # Function to check if the URL points to an undesirable file type
+#   one set lookup on the extension of the URL path (the query string is ignored)
 def is_desirable_url(url):
-    # Define undesirable file types (PDFs, videos, JavaScript, CSS)
-    undesirable_extensions = ['.pdf', '.mp4', '.mov', '.avi', '.js', '.css', '.jpeg', '.jpg', '.png', '.gif', '.webm', 'xml', 'json', 'ppt', 'pptx', 'doc', 'docx', 'xls', 'xlsx', 'csv', 'zip', 'rar', 'tar', 'gz', '7z', 'exe', 'bin', 'dmg', 'iso', 'apk', 'deb', 'rpm', 'torrent', 'woff', 'woff2', 'ttf', 'otf', 'eot', 'svg', 'ico', 'mp3', 'wav', 'flac', 'ogg', 'wma', 'aac', 'm4a', 'opus', 'mid', 'midi', 'kar', 'webp', 'bmp', 'tiff', 'tif', 'eps', 'svgz', '3gp', '3g2', 'mkv', 'webm', 'flv', 'vob', 'ogv', 'ogg', 'drc', 'gifv', 'mng', 'avi', 'mov', 'qt', 'wmv', 'yuv', 'rm', 'rmvb', 'asf', 'amv', 'mpg', 'mp2', 'mpeg', 'mpe', 'mpv', 'mpg', 'mpeg', 'm2v', 'm4v', 'svi', '3gp', '3g2', 'mxf', 'roq', 'nsv', 'flv', 'f4v', 'f4p', 'f4a', 'f4b']
-    return not any(url.endswith(ext) for ext in undesirable_extensions)
+    last_segment = urlparse(url).path.rsplit('/', 1)[-1]
+    if '.' not in last_segment:
+        return True
+    return last_segment.rsplit('.', 1)[1].lower() not in UNDESIRABLE_EXTENSIONS
+
+# Function to pick the same-domain links worth following from a page's hrefs
+#   page_url -- URL the page was fetched from (after redirects), to resolve relative hrefs against
+def extract_links(hrefs, page_url, base_netloc):
+    links = []
+    for href in hrefs:
+        # Resolve relative URLs to absolute URLs, in canonical form (no #fragment, sorted query, ...)
+        try:
+            full_url = canonical_url(urllib.parse.urljoin(page_url, href))
+        except ValueError:
+            continue  # malformed href (i.e. a port out of range, a broken IPv6 host): not a link to follow
+        parsed_url = urlparse(full_url)
+        # Only follow links within the same domain
+        if parsed_url.scheme in ('http', 'https') and parsed_url.netloc == base_netloc and is_desirable_url(full_url):
+            links.append(full_url)
+    return links
+
+# Function to fetch one page, count the DEI phrases in it and collect its links
+#   returns ({phrase: count}, links, snippets); snippets is None unless KWIC is on
+#   history -- optional ScanHistory; turns on the incremental mode (see scan_page_incremental)
+#   budget  -- optional CrawlBudget; the downloaded bytes are counted against it
+def scan_page(current_url, dei_phrases, base_netloc, history=None, budget=None):
+    if history is not None:
+        return scan_page_incremental(current_url, dei_phrases, base_netloc, history, budget)
+
+    text, hrefs, page_url = fetch_page(current_url, budget=budget, site=base_netloc)
+
+    counts, snippets = analyze_text(text, dei_phrases)
+    links = extract_links(hrefs, page_url, base_netloc)
+    return counts, links, snippets
+
+# Function to count the DEI phrases in the text of a page, with KWIC snippets when KWIC is on
+#   returns ({phrase: count}, snippets); snippets is None unless KWIC is on
+def analyze_text(text, dei_phrases):
+    if not text:
+        return {}, [] if KWIC else None
+    # Identify DEI phrases on the current page
+    if KWIC:
+        return count_dei_phrases_in_context(text, dei_phrases)
+    return count_dei_phrases(text, dei_phrases), None
+
+# Function to scan one page incrementally against the previous scan:
+#   - a conditional GET (If-None-Match / If-Modified-Since) lets the server answer 304 Not Modified
+#   - a 304, or a page whose extracted text hashes the same as last time, reuses the previous counts
+#     and skips tokenize/match (so it has no KWIC snippets)
+def scan_page_incremental(current_url, dei_phrases, base_netloc, history, budget=None):
+    previous = history.get(current_url)
+
+    headers = {}
+    if previous and previous['etag']:
+        headers['If-None-Match'] = previous['etag']
+    if previous and previous['last_modified']:
+        headers['If-Modified-Since'] = previous['last_modified']
+
+    response, content = fetch_counted(current_url, headers, budget)
+    if response is None:
+        return {}, [], None
+    page_url = response.url or current_url  # after redirects, for resolving the relative hrefs
+    if response.status_code == 304 and previous:
+        history.mark_unchanged(current_url)
+        metrics.skip('not_modified')
+        return previous['counts'], extract_links(previous['hrefs'], page_url, base_netloc), None
+
+    text, hrefs = parse_page(content, site=base_netloc)
+    text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    changed = previous is None or previous['text_hash'] != text_hash
+    if changed:
+        counts, snippets = analyze_text(text, dei_phrases)
+    else:
+        counts, snippets = previous['counts'], None
+        metrics.skip('unchanged')
+
+    history.record(current_url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                   text_hash, counts, hrefs, changed)
+    return counts, extract_links(hrefs, page_url, base_netloc), snippets
 
-# Function to check if the URL is a bookmark link (i.e., containing '#')
-def is_bookmark_link(url):
-    #return url.startswith('#')
-    return '#' in url
+# Function to get the robots.txt rules of the site to crawl (allow everything when ROBOTS_TXT is off);
+# its Crawl-delay also caps the site's rate limiter
+def get_site_rules(url):
+    rules = load_site_rules(url) if ROBOTS_TXT else SiteRules()
+    rate_limiters.get(urlparse(url).netloc).set_crawl_delay(rules.crawl_delay)
+    return rules
+
+# Function to find the pages listed in the sitemaps of the site, as canonical same-site URLs
+# that robots.txt allows (none when SITEMAPS is off)
+def discover_pages(url, rules):
+    if not SITEMAPS:
+        return []
+    locs = islice(iter_sitemap_urls(get_sitemap_urls(url, rules)), SITEMAP_LIMIT)
+    pages = [page_url for page_url in extract_links(locs, url, urlparse(url).netloc) if rules.allowed(page_url)]
+    if pages:
+        print(f"Found {len(pages)} pages in the sitemaps of {urlparse(url).netloc}")
+    return pages
+
+# Function to pick up a saved crawl: returns the (url, depth) pairs to visit, the URLs already visited
+# and the phrase totals so far (a fresh start when there is no state, nothing saved yet or the saved
+# crawl had finished). A fresh start is seeded with the start URL and the pages from the sitemaps,
+# all at depth 0.
+def resume_crawl(url, state, rules=None):
+    if state is not None and state.has_progress():
+        print(f"Resuming scan of {url} from {state.path}")
+        return state.load_frontier(), state.load_visited(), state.load_totals()
+    if state is not None:
+        state.reset()  # a finished earlier scan: its results are not reused
+
+    rules = rules or SiteRules()
+    to_visit = list(dict.fromkeys([url] + discover_pages(url, rules)))
+    if not rules.allowed(url):
+        print(f"robots.txt does not allow scanning {url}")
+        to_visit.remove(url)
+    to_visit = [(next_url, 0) for next_url in to_visit]
+    if state is not None:
+        state.add_to_frontier(to_visit)
+    return to_visit, set(), Counter()
+
+# Function to decide what to do with a page refused with 429/503: True to queue it again,
+# False after THROTTLE_RETRIES attempts, when the page is given up on (and reported)
+#   attempts -- Counter of the throttled attempts per URL in this crawl
+def retry_throttled(error, attempts):
+    attempts[error.url] += 1
+    if attempts[error.url] <= THROTTLE_RETRIES:
+        return True
+    print(f"Giving up on {error.url} after {THROTTLE_RETRIES} retries: {error}")
+    metrics.error(error)
+    return False
+
+# Function to handle the result of one scanned page: print it, add it to the totals
+# and append it to the results file (with its KWIC snippets, if any)
+def record_page_result(current_url, counts, totals, results_writer=None, snippets=None):
+    if counts:
+        print(f"DEI-related phrases found: {current_url} | {format_counts(counts, ', ')}")
+    totals.update(counts)
+    if results_writer is not None:
+        results_writer.write(PageResult(current_url, counts, snippets))
+    metrics.add('pages')
+    metrics.tick()
 
 # Function to crawl the website and collect subpage URLs
-def crawl_website(url, visited=set(), dei_phrases=[]):
-    to_visit = [url]
-    found_phrases = []
-
-    while to_visit:
-        current_url = to_visit.pop()
-        if current_url not in visited:
-            visited.add(current_url)
+#   state   -- optional CrawlState; progress is checkpointed to it and resumed from it
+#   history -- optional ScanHistory for the incremental mode
+#   results_writer -- optional ResultsWriter; every page's counts are appended to it
+#   budget  -- optional CrawlBudget (default: the MAX_PAGES/MAX_BYTES/MAX_SECONDS limits); when it runs
+#              out the crawl stops and returns the partial totals, and a saved state resumes from there
+# Pages are taken in CRAWL_ORDER up to MAX_DEPTH links from the start (or from a sitemap page).
+# Returns the total count of each DEI phrase over all pages (a Counter)
+def crawl_website(url, visited=None, dei_phrases=[], state=None, history=None, results_writer=None, budget=None):
+    check_boilerplate_mode(history=history)
+    if history is not None:
+        history.use_terms(get_phrase_matcher(dei_phrases).signature)
+    url = canonical_url(url)
+    rules = get_site_rules(url)
+    to_visit, saved_visited, totals = resume_crawl(url, state, rules)
+    base_netloc = urlparse(url).netloc
+    if BOILERPLATE:
+        start_boilerplate_filter(base_netloc)
+    budget = budget or get_crawl_budget()
+
+    # Deduplicating frontier: every URL is queued at most once; visited URLs are never queued again
+    frontier = new_frontier(new_seen_set())
+    throttled = Counter()  # 429/503 refusals per URL
+    frontier.seen.update(saved_visited)
+    frontier.seen.update(visited or ())
+    del saved_visited
+    for next_url, depth in to_visit:
+        frontier.add(next_url, depth)
+
+    try:
+        while frontier:
+            stop_reason = budget.exhausted()
+            if stop_reason:
+                print(f"Stopping scan: {stop_reason} ({len(frontier)} pages not scanned)")
+                break
+            current_url, depth = frontier.pop()
             #debug# print(f"Scraping: {current_url}")
 
-            # Fetch the content of the current page
-            text, soup = fetch_website_content(current_url)
-
-            if text:
-                # Identify DEI phrases on the current page
-                dei_phrases_found = identify_dei_phrases(text, dei_phrases)
-
-                if dei_phrases_found:
-                    print(f"DEI-related phrases found: {current_url} | {dei_phrases_found}")
-                found_phrases.extend(dei_phrases_found)
-            
-
-            # Extract all links in the page
-            if soup:
-                links = soup.find_all('a', href=True)
-                for link in links:
-                    href = link['href']
-                    # Resolve relative URLs to absolute URLs
-                    full_url = urllib.parse.urljoin(current_url, href)
-                    parsed_url = urlparse(full_url)
-                    # Only follow links within the same domain
-                    if parsed_url.netloc == urlparse(url).netloc and full_url not in visited and is_desirable_url(full_url) and not is_bookmark_link(full_url):
-                        to_visit.append(full_url)
+            # Fetch the content of the current page and extract all links in it
+            rules.wait()  # robots.txt Crawl-delay
+            try:
+                counts, links, snippets = scan_page(current_url, dei_phrases, base_netloc, history, budget)
+            except ThrottledError as e:
+                if retry_throttled(e, throttled):
+                    frontier.push(current_url, depth)  # scanned again once the host's pause is over
+                continue
+            budget.add_page()
+            record_page_result(current_url, counts, totals, results_writer, snippets)
 
-    return found_phrases
+            new_links = [(full_url, depth + 1) for full_url in links
+                         if rules.allowed(full_url) and frontier.add(full_url, depth + 1)]
+            if state is not None:
+                state.record_page(current_url, counts, new_links)
+    finally:
+        if state is not None:
+            state.checkpoint()
+
+    return totals
+
+# Function to crawl the website with many pages in flight at once
+#   max_workers  -- global limit on pages being fetched/parsed/matched at the same time
+#   max_per_host -- limit on pages in flight against any single host
+#   state        -- optional CrawlState; progress is checkpointed to it and resumed from it
+#   history      -- optional ScanHistory for the incremental mode
+#   results_writer -- optional ResultsWriter; every page's counts are appended to it
+#   budget       -- optional CrawlBudget, as for crawl_website; pages in flight are finished when it runs out
+# Returns the total count of each DEI phrase over all pages (a Counter)
+def crawl_website_concurrent(url, dei_phrases=[], max_workers=8, max_per_host=4, state=None, history=None,
+                             results_writer=None, budget=None):
+    check_boilerplate_mode(history=history)
+    if history is not None:
+        history.use_terms(get_phrase_matcher(dei_phrases).signature)
+    url = canonical_url(url)
+    base_netloc = urlparse(url).netloc
+    if BOILERPLATE:
+        start_boilerplate_filter(base_netloc)
+    rules = get_site_rules(url)
+    to_visit, visited, totals = resume_crawl(url, state, rules)
+    if rules.crawl_delay:
+        max_per_host = 1  # a Crawl-delay asks for one request at a time
+    budget = budget or get_crawl_budget()
+
+    seen = new_seen_set()             # URLs already queued or scanned
+    seen.update(visited)
+    seen.update(next_url for next_url, _ in to_visit)
+    del visited
+    host_queues = defaultdict(new_frontier)  # URLs waiting for a free slot, per host, in CRAWL_ORDER
+    for next_url, depth in to_visit:
+        host_queues[urlparse(next_url).netloc].push(next_url, depth)
+    host_in_flight = defaultdict(int)
+    throttled = Counter()             # 429/503 refusals per URL
+    pending = {}                      # future -> (url, host, depth)
+    stop_reason = None
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or (any(host_queues.values()) and not stop_reason):
+                # Fill the free worker slots without exceeding any host's limit or the budget
+                for host, queue in host_queues.items():
+                    while queue and len(pending) < max_workers and host_in_flight[host] < max_per_host:
+                        stop_reason = budget.exhausted(in_flight=len(pending))
+                        if stop_reason:
+                            break
+                        next_url, depth = queue.pop()
+                        host_in_flight[host] += 1
+                        rules.wait()  # robots.txt Crawl-delay
+                        future = executor.submit(scan_page, next_url, dei_phrases, base_netloc, history, budget)
+                        pending[future] = (next_url, host, depth)
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    current_url, host, depth = pending.pop(future)
+                    host_in_flight[host] -= 1
+                    try:
+                        counts, links, snippets = future.result()
+                    except ThrottledError as e:
+                        if retry_throttled(e, throttled):
+                            host_queues[host].push(current_url, depth)  # the host's limiter paces the retry
+                        continue
+                    budget.add_page()
+                    record_page_result(current_url, counts, totals, results_writer, snippets)
+
+                    new_links = []
+                    for full_url in links:
+                        if full_url not in seen and rules.allowed(full_url) \
+                                and host_queues[urlparse(full_url).netloc].push(full_url, depth + 1):
+                            seen.add(full_url)
+                            new_links.append((full_url, depth + 1))
+                    if state is not None:
+                        state.record_page(current_url, counts, new_links)
+        if stop_reason:
+            print(f"Stopping scan: {stop_reason} ({sum(map(len, host_queues.values()))} pages not scanned)")
+    finally:
+        if state is not None:
+            state.checkpoint()
+
+    return totals
+
+# Function to crawl one shard of a site in a worker process (see crawl_website_sharded)
+#   scans the queued pages whose URL hashes to this shard until no shard has pages left;
+#   returns the number of pages this worker scanned
+def crawl_shard(url, store_path, shard, shards, dei_phrases):
+    base_netloc = urlparse(url).netloc
+    if BOILERPLATE:
+        start_boilerplate_filter(base_netloc)
+    rules = get_site_rules(url)
+    store = ShardStore(store_path, url, shards)
+    scanned = 0
+    throttled = Counter()  # 429/503 refusals per URL
+    try:
+        while not store.aborted():
+            batch = store.claim(shard)
+            if not batch:
+                if store.is_finished():
+                    break
+                time.sleep(0.2)  # other workers may still queue pages for this shard
+                continue
+
+            results, links = [], []
+            for current_url, depth in batch:
+                rules.wait()  # robots.txt Crawl-delay
+                error = None
+                while True:
+                    try:
+                        counts, page_links, snippets = scan_page(current_url, dei_phrases, base_netloc)
+                        break
+                    except ThrottledError as e:
+                        if not retry_throttled(e, throttled):
+                            counts, page_links, snippets = {}, [], None
+                            break
+                    except Exception as e:
+                        # A page that cannot be scanned is stored as done, with the error, so the
+                        # other workers do not wait for it forever
+                        error = f"{type(e).__name__}: {e}"
+                        print(f"Error scanning {current_url}: {error}")
+                        counts, page_links, snippets = {}, [], None
+                        break
+                record_page_result(current_url, counts, Counter())
+                results.append((current_url, counts, snippets, error))
+                if MAX_DEPTH is None or depth < MAX_DEPTH:
+                    links.extend((link, depth + 1) for link in page_links if rules.allowed(link))
+            store.complete(results, links)
+            scanned += len(batch)
+    except BaseException as e:
+        store.abort(f"shard {shard}: {type(e).__name__}: {e}")  # stop the other workers too
+        raise
+    finally:
+        store.close()
+    return scanned
+
+# Function to crawl one site with several worker processes, so HTML parsing uses several cores.
+# Every URL belongs to one shard by URL hash, and each worker process scans one shard.
+#   shards     -- number of worker processes
+#   store_path -- SQLite file the workers share (frontier, visited URLs and per-page results);
+#                 an interrupted crawl resumes from it, a finished one is scanned again from the start
+#   results_writer -- optional ResultsWriter; the merged per-page results are written to it
+# Returns the total count of each DEI phrase over all pages (a Counter), merged from all shards
+def crawl_website_sharded(url, dei_phrases=[], shards=4, store_path="deia_shards.sqlite", results_writer=None):
+    url = canonical_url(url)
+    check_sharded_mode(shards)
+    rules = get_site_rules(url)
+    if rules.crawl_delay and shards > 1:
+        print("robots.txt asks for a Crawl-delay; crawling with a single worker")
+        shards = 1
+    check_boilerplate_mode(shards=shards)
+
+    store = ShardStore(store_path, url, shards)
+    try:
+        store.reset_claims()
+        if store.has_progress() and not store.is_finished():
+            print(f"Resuming scan of {url} from {store_path}")
+        else:
+            store.reset()  # a finished earlier scan: its results are not reused
+            to_visit, _, _ = resume_crawl(url, None, rules)
+            store.add_urls(to_visit)
+
+        # Compile the matcher once; every worker gets a copy
+        matcher = get_phrase_matcher(dei_phrases)
+        with ProcessPoolExecutor(max_workers=shards) as executor:
+            futures = [executor.submit(crawl_shard, url, store_path, shard, shards, matcher)
+                       for shard in range(shards)]
+            # A worker that fails (or dies) leaves its claimed pages unscanned, so the others are
+            # told to stop instead of waiting for them
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = [future for future in done if future.exception() is not None]
+            if failed:
+                store.abort(f"{type(failed[0].exception()).__name__}: {failed[0].exception()}")
+            wait(futures)
+        if failed:
+            print(f"Stopping scan: a worker process failed; run again to resume from {store_path}")
+            raise failed[0].exception()
+        pages = sum(future.result() for future in futures)
+        print(f"Scanned {pages} pages with {shards} worker processes")
+        for page_url, error in store.failed_pages():
+            print(f"  failed: {page_url} ({error})")
+
+        # Merge the per-page results of all shards
+        totals = Counter()
+        for page_url, counts, snippets in store.iter_results():
+            totals.update(counts)
+            if results_writer is not None:
+                results_writer.write(PageResult(page_url, counts, snippets))
+    finally:
+        store.close()
+
+    return totals
+
+# Function to scan the pages of an archive instead of a live site: a WARC file (.warc, .warc.gz)
+# or a mirror directory (see idDEIA_archive). Nothing is requested over the network; the pages go
+# through the same parse, tokenize and match steps as fetched ones. A URL captured more than once
+# is scanned once, from its first capture.
+#   base_url -- URL of a mirror directory's root (by default its first folder is the host)
+# Returns the total count of each DEI phrase over all pages (a Counter)
+def scan_archive(path, dei_phrases=[], results_writer=None, budget=None, base_url=None):
+    budget = budget or get_crawl_budget()
+    matcher = get_phrase_matcher(dei_phrases)
+    seen = new_seen_set()
+    totals = Counter()
+    for page_url, content in iter_archive_pages(path, base_url):
+        stop_reason = budget.exhausted()
+        if stop_reason:
+            print(f"Stopping scan: {stop_reason}")
+            break
+        page_url = canonical_url(page_url)
+        if page_url in seen or not is_desirable_url(page_url):
+            continue
+        seen.add(page_url)
+        metrics.add('bytes_fetched', len(content))
+        budget.add_bytes(len(content))
+        budget.add_page()
+
+        text, _ = parse_page(content, site=urlparse(page_url).netloc)
+        counts, snippets = analyze_text(text, matcher)
+        record_page_result(page_url, counts, totals, results_writer, snippets)
+    return totals
 
 # Function to combine word counts -- helped by Copilot 
+#   paragraphs can also be {phrase: count} totals (i.e. from crawl_website), which are formatted directly
 def combine_word_counts(paragraphs):
-    # Use a regular expression to find all occurrences of the pattern "word (count)"
-    pattern = re.compile(r'(\w+)\s\((\d+)\)')
+    if isinstance(paragraphs, dict):
+        return format_counts(paragraphs)
+
+    # Use a regular expression to find all occurrences of the pattern "phrase (count)",
+    # including multi-word and hyphenated phrases like "equal opportunity (2)" and "bias-free (1)"
+    pattern = re.compile(r'(\w[\w\- ]*?)\s\((\d+)\)')
     
     # Use a dictionary to store the combined counts
     word_counts = defaultdict(int)
@@ -207,8 +914,16 @@ def combine_word_counts(paragraphs):
 # Main function to execute the process
 def main():
 
+    # Optional offline scan of a WARC file or mirror directory instead of the live site
+    archive = os.getenv("ARCHIVE")
+
     url = os.getenv("URL")
-    if not url:
+    if archive:
+        print(f"Scanning archive: {archive}")
+    elif not url and not INTERACTIVE:
+        print("Set URL in the environment or .env file when NON_INTERACTIVE is on.")
+        return
+    elif not url:
         print (f"\n================================================")
         print (f"==     DEIA Compliance Scanner | Max Tsai     ==")
         print (f"================================================\n")
@@ -217,10 +932,86 @@ def main():
     else:
         print(f"Scanning website: {url}")
 
-    dei_phrases = get_dei_phrases(True)    #True for Synonyms
+    # BOILERPLATE keeps the blocks seen in this process, so it works with neither SHARDS nor SCAN_HISTORY;
+    # the SHARDS worker processes follow no budget, crawl order, crawl state or scan history
+    if not archive:
+        try:
+            check_boilerplate_mode(int(os.getenv("SHARDS", "1")), os.getenv("SCAN_HISTORY") or None)
+            check_sharded_mode(int(os.getenv("SHARDS", "1")), os.getenv("CRAWL_STATE") or None,
+                               os.getenv("SCAN_HISTORY") or None)
+        except ValueError as e:
+            print(e)
+            return
+
+    # Expanded DEIA terms and their compiled matcher, loaded from the term index cache after the first run
+    _, dei_phrases = load_term_index(True)    #True for Synonyms
+
+    # Optional results file (.jsonl or .csv): one row per page, written as the crawl goes
+    results_path = os.getenv("RESULTS_FILE")
+    try:
+        results_writer = ResultsWriter(results_path, snippets=KWIC) if results_path else None
+    except ValueError as e:
+        print(e)
+        return
+
+    # Optional crawl state file, so an interrupted scan can be resumed
+    state_path = os.getenv("CRAWL_STATE")
+    state = CrawlState(state_path, url, int(os.getenv("STATE_BATCH", "100"))) if state_path and not archive else None
+
+    # Optional scan history for incremental re-scans: unchanged pages reuse the last scan's counts
+    history_path = os.getenv("SCAN_HISTORY")
+    history = ScanHistory(history_path) if history_path and not archive else None
+
+    # Optional ranked report (REPORT_TOP pages): the per-page counts are collected into a sparse matrix
+    report_top = int(os.getenv("REPORT_TOP", "0"))
+    term_matrix = None
+    if report_top > 0:
+        from idDEIA_ranking import TermMatrix  # NumPy and SciPy are only needed for the report
+        term_matrix = TermMatrix()
+        results_writer = ResultsTee([results_writer, term_matrix] if results_writer else [term_matrix])
 
     # Crawl the website and identify DEI-related phrases
-    found_phrases = crawl_website(url, dei_phrases=dei_phrases)
+    concurrency = int(os.getenv("CONCURRENCY", "1"))
+    shards = int(os.getenv("SHARDS", "1"))
+    shard_store = os.getenv("SHARD_STORE", "deia_shards.sqlite")
+    try:
+        if archive:
+            found_phrases = scan_archive(archive, dei_phrases=dei_phrases, results_writer=results_writer,
+                                         base_url=os.getenv("ARCHIVE_BASE_URL"))
+        elif shards > 1:
+            found_phrases = crawl_website_sharded(url, dei_phrases=dei_phrases, shards=shards,
+                                                  store_path=shard_store, results_writer=results_writer)
+        elif concurrency > 1:
+            max_per_host = int(os.getenv("MAX_PER_HOST", str(concurrency)))
+            found_phrases = crawl_website_concurrent(url, dei_phrases=dei_phrases, max_workers=concurrency,
+                                                     max_per_host=max_per_host, state=state, history=history,
+                                                     results_writer=results_writer)
+        else:
+            found_phrases = crawl_website(url, dei_phrases=dei_phrases, state=state, history=history,
+                                          results_writer=results_writer)
+    except KeyboardInterrupt:
+        if shards > 1:
+            print(f"\nScan interrupted; progress saved to {shard_store}. Run again to resume.")
+            return
+        if state is None:
+            raise
+        print(f"\nScan interrupted; progress saved to {state_path}. Run again to resume.")
+        return
+    finally:
+        if state is not None:
+            state.close()
+        if history is not None:
+            history.close()
+        if results_writer is not None:
+            results_writer.close()
+        if metrics.enabled:
+            print(metrics.progress_line())
+            metrics.write()
+
+    if history is not None:
+        print(f"\nIncremental scan: {len(history.changed_urls)} new or changed pages, {history.unchanged} unchanged")
+        for changed_url in history.changed_urls:
+            print(f"  changed: {changed_url}")
 
     if found_phrases:
         print("\n======\nKey DEI-related phrases found that may violate Executive Order 14173:")
@@ -230,6 +1021,9 @@ def main():
         '''
         combined_counts = combine_word_counts(found_phrases)
         print(combined_counts)
+        if term_matrix is not None:
+            from idDEIA_ranking import print_ranking_report
+            print_ranking_report(term_matrix, report_top, int(os.getenv("REPORT_SECTION_DEPTH", "1")))
     else:
         print("No DEI-related phrases found that may violate Executive Order 14173.")
 
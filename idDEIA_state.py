@@ -0,0 +1,338 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Persistent crawl state, so a long scan can be stopped (or crash) and be resumed later.
+The frontier, the visited URLs and the per-page results are kept in a SQLite file.
+Writes are buffered in memory and committed in batches (checkpoints), so saving the
+state never becomes the bottleneck of the crawl; at most the last batch is re-scanned
+after a crash.
+The scan history keeps what is needed between weekly scans for the incremental mode.
+The shard store is the shared frontier and result table of a site crawled by several
+worker processes at once.
+------------------------------------------------------
+"""
+import json
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from idDEIA_urls import url_fingerprint
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS frontier (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT UNIQUE NOT NULL,
+                                     depth INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS visited (url TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS results (url TEXT PRIMARY KEY, counts TEXT NOT NULL);
+"""
+
+class CrawlState:
+    # Open (or create) the state file for a crawl starting at start_url
+    def __init__(self, path, start_url, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {column[1] for column in self.conn.execute("PRAGMA table_info(frontier)")}
+        if 'depth' not in columns:  # state saved before the link depth was kept
+            self.conn.execute("ALTER TABLE frontier ADD COLUMN depth INTEGER NOT NULL DEFAULT 0")
+
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'start_url'").fetchone()
+        if row is None:
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('start_url', ?)", (start_url,))
+            self.conn.commit()
+        elif row[0] != start_url:
+            raise ValueError(f"Crawl state {path} belongs to a scan of {row[0]}, not {start_url}")
+
+        self._queued = []    # (url, depth) of the links discovered since the last checkpoint
+        self._scanned = []   # (url, counts json) scanned since the last checkpoint
+
+    # Function to get the URLs visited in earlier runs
+    def load_visited(self):
+        return {url for (url,) in self.conn.execute("SELECT url FROM visited")}
+
+    # Function to get the URLs still waiting to be scanned, in the order they were found,
+    # as (url, depth) pairs; depth is the number of links from the start of the crawl
+    def load_frontier(self):
+        return self.conn.execute(
+            "SELECT url, depth FROM frontier WHERE url NOT IN (SELECT url FROM visited) ORDER BY id").fetchall()
+
+    # Function to get the phrase totals of the pages scanned in earlier runs, like crawl_website returns
+    def load_totals(self):
+        totals = Counter()
+        for (counts,) in self.conn.execute("SELECT counts FROM results"):
+            totals.update(json.loads(counts))
+        return totals
+
+    # Function to check if there is anything to resume: an earlier run scanned pages and left
+    # some still waiting (a finished scan has nothing left to resume)
+    def has_progress(self):
+        if self.conn.execute("SELECT 1 FROM visited LIMIT 1").fetchone() is None:
+            return False
+        return self.conn.execute(
+            "SELECT 1 FROM frontier WHERE url NOT IN (SELECT url FROM visited) LIMIT 1").fetchone() is not None
+
+    # Function to drop the frontier, visited URLs and results of an earlier run, to scan the site
+    # again from the start
+    def reset(self):
+        self._queued = []
+        self._scanned = []
+        with self.conn:
+            self.conn.execute("DELETE FROM frontier")
+            self.conn.execute("DELETE FROM visited")
+            self.conn.execute("DELETE FROM results")
+
+    # Function to queue (url, depth) pairs in the frontier
+    def add_to_frontier(self, urls):
+        self._queued.extend(urls)
+        self._maybe_checkpoint()
+
+    # Function to record a scanned page: its {phrase: count} and the (url, depth) links it added to the frontier
+    def record_page(self, url, counts, new_links=()):
+        self._scanned.append((url, json.dumps(counts)))
+        self._queued.extend(new_links)
+        self._maybe_checkpoint()
+
+    def _maybe_checkpoint(self):
+        if len(self._scanned) >= self.batch_size or len(self._queued) >= self.batch_size * 50:
+            self.checkpoint()
+
+    # Function to write all buffered changes to disk in one transaction
+    def checkpoint(self):
+        if not self._scanned and not self._queued:
+            return
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO frontier (url, depth) VALUES (?, ?)", self._queued)
+            self.conn.executemany("INSERT OR IGNORE INTO visited (url) VALUES (?)",
+                                  ((url,) for url, _ in self._scanned))
+            self.conn.executemany("INSERT OR REPLACE INTO results (url, counts) VALUES (?, ?)", self._scanned)
+        self._queued = []
+        self._scanned = []
+
+    # Function to checkpoint and close the state file
+    def close(self):
+        self.checkpoint()
+        self.conn.close()
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    text_hash TEXT,
+    counts TEXT NOT NULL,
+    hrefs TEXT NOT NULL
+);
+"""
+
+class ScanHistory:
+    # Open (or create) the history of earlier scans used by the incremental mode.
+    # It keeps, per URL, the HTTP validators (ETag, Last-Modified), a hash of the extracted
+    # text, the phrase counts and the page's links, so unchanged pages need no re-analysis.
+    def __init__(self, path, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()  # shared by the crawl worker threads
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(HISTORY_SCHEMA)
+        self._pending = []
+        self.changed_urls = []   # new or modified pages in this scan
+        self.unchanged = 0       # pages reused from the previous scan
+
+    # Function to tie the history to the phrase matcher that makes its counts (PhraseMatcher.signature).
+    # The counts of a history made with another term list, MATCH_MODE or stop words are dropped,
+    # so every page is scanned again.
+    def use_terms(self, signature):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'terms'").fetchone()
+            if row is not None and row[0] == signature:
+                return
+            if row is not None:
+                print(f"Scan history {self.path} was made with other DEIA terms or MATCH_MODE; scanning every page again")
+            self._pending = []
+            with self.conn:
+                self.conn.execute("DELETE FROM pages")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('terms', ?)", (signature,))
+
+    # Function to get the previous scan of a URL as a dict, or None when it was never scanned
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, text_hash, counts, hrefs FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, text_hash, counts, hrefs = row
+        return {'etag': etag, 'last_modified': last_modified, 'text_hash': text_hash,
+                'counts': json.loads(counts), 'hrefs': json.loads(hrefs)}
+
+    # Function to store the scan of a URL; changed is False when the previous results were reused
+    def record(self, url, etag, last_modified, text_hash, counts, hrefs, changed=True):
+        with self.lock:
+            self._pending.append((url, etag, last_modified, text_hash, json.dumps(counts), json.dumps(hrefs)))
+            if changed:
+                self.changed_urls.append(url)
+            else:
+                self.unchanged += 1
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    # Function to count a page that answered 304 Not Modified (nothing to store)
+    def mark_unchanged(self, url):
+        with self.lock:
+            self.unchanged += 1
+
+    def _flush(self):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, text_hash, counts, hrefs) "
+                "VALUES (?, ?, ?, ?, ?, ?)", self._pending)
+        self._pending = []
+
+    # Function to write the buffered scans to disk
+    def checkpoint(self):
+        with self.lock:
+            if self._pending:
+                self._flush()
+
+    # Function to checkpoint and close the history file
+    def close(self):
+        self.checkpoint()
+        self.conn.close()
+
+SHARD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    status INTEGER NOT NULL DEFAULT 0,
+    counts TEXT,
+    snippets TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_by_shard ON pages (shard, status);
+"""
+
+# Page status in the shard store
+QUEUED, CLAIMED, DONE = 0, 1, 2
+
+class ShardStore:
+    # Open (or create) the store shared by the worker processes crawling one site.
+    # Every URL belongs to one shard, by URL hash; a worker claims a batch of its shard's queued
+    # pages, scans them, and then in one transaction stores their counts and queues the links
+    # it found into whichever shards they hash to. Every process opens its own connection.
+    def __init__(self, path, start_url, shards, batch_size=20):
+        self.path = path
+        self.shards = shards
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)  # transactions are explicit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SHARD_SCHEMA)
+        columns = {column[1] for column in self.conn.execute("PRAGMA table_info(pages)")}
+        if 'error' not in columns:  # store made before failed pages were kept
+            self.conn.execute("ALTER TABLE pages ADD COLUMN error TEXT")
+
+        with self._transaction():
+            for key, value in (('start_url', start_url), ('shards', str(shards))):
+                row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, value))
+                elif row[0] != value:
+                    raise ValueError(f"Shard store {path} has {key} {row[0]}, not {value}")
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers never claim the same page
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # Function to get the shard of a URL
+    def shard_of(self, url):
+        return url_fingerprint(url) % self.shards
+
+    # Function to check if an earlier run already queued pages
+    def has_progress(self):
+        return self.conn.execute("SELECT 1 FROM pages LIMIT 1").fetchone() is not None
+
+    # Function to drop the pages and results of an earlier run, to scan the site again from the start
+    def reset(self):
+        with self._transaction():
+            self.conn.execute("DELETE FROM pages")
+
+    # Function to put pages claimed by workers of an interrupted or aborted run back in the queue
+    def reset_claims(self):
+        with self._transaction():
+            self.conn.execute("UPDATE pages SET status = ? WHERE status = ?", (QUEUED, CLAIMED))
+            self.conn.execute("DELETE FROM meta WHERE key = 'aborted'")
+
+    # Function to tell every worker to stop, i.e. when one of them failed; its claimed pages
+    # stay claimed until the next run puts them back in the queue
+    def abort(self, reason):
+        with self._transaction():
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('aborted', ?)", (reason,))
+
+    # Function to get why the crawl was aborted, or None
+    def aborted(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'aborted'").fetchone()
+        return row[0] if row else None
+
+    # Function to queue (url, depth) pairs; URLs seen before are ignored
+    def add_urls(self, urls):
+        with self._transaction():
+            self._insert(urls)
+
+    def _insert(self, urls):
+        self.conn.executemany("INSERT OR IGNORE INTO pages (url, shard, depth) VALUES (?, ?, ?)",
+                              ((url, self.shard_of(url), depth) for url, depth in urls))
+
+    # Function to claim the next batch of queued pages of a shard; returns [(url, depth)]
+    def claim(self, shard):
+        with self._transaction():
+            rows = self.conn.execute("SELECT url, depth FROM pages WHERE shard = ? AND status = ? LIMIT ?",
+                                     (shard, QUEUED, self.batch_size)).fetchall()
+            self.conn.executemany("UPDATE pages SET status = ? WHERE url = ?", ((CLAIMED, url) for url, _ in rows))
+        return rows
+
+    # Function to store the (url, counts, snippets, error) of scanned pages and queue the (url, depth)
+    # links they led to; snippets is None unless KWIC is on, error is None unless the page failed
+    def complete(self, results, links):
+        with self._transaction():
+            self.conn.executemany("UPDATE pages SET status = ?, counts = ?, snippets = ?, error = ? WHERE url = ?",
+                                  ((DONE, json.dumps(counts), None if snippets is None else json.dumps(snippets),
+                                    error, url)
+                                   for url, counts, snippets, error in results))
+            self._insert(links)
+
+    # Function to check if every queued page of every shard has been scanned
+    def is_finished(self):
+        return self.conn.execute("SELECT 1 FROM pages WHERE status != ? LIMIT 1", (DONE,)).fetchone() is None
+
+    # Function to iterate over the scanned pages as (url, {phrase: count}, snippets)
+    def iter_results(self):
+        rows = self.conn.execute("SELECT url, counts, snippets FROM pages WHERE status = ? ORDER BY rowid", (DONE,))
+        for url, counts, snippets in rows:
+            yield url, json.loads(counts), None if snippets is None else json.loads(snippets)
+
+    # Function to get the (url, error) of the pages that failed to scan
+    def failed_pages(self):
+        return self.conn.execute("SELECT url, error FROM pages WHERE error IS NOT NULL ORDER BY rowid").fetchall()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,230 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+URL canonicalization and the deduplicating crawl frontier. CMS-driven sites link to the
+same page in many spellings (host case, default port, query parameter order, tracking
+parameters, #fragments, optionally the trailing slash); canonicalizing every link before it is queued
+means each page is fetched once. The frontier pops URLs depth first, breadth first or by
+priority (URL patterns such as /about first), and can stop following links past a
+maximum depth, which keeps calendar and pagination traps from running forever.
+For very large sites the set of seen URLs can be kept as 64-bit fingerprints (about
+16 bytes per URL) or in a Bloom filter (about 2 bytes per URL) instead of URL strings.
+------------------------------------------------------
+"""
+import hashlib
+import heapq
+import math
+from array import array
+from collections import deque
+from itertools import count
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that never change the page content; a trailing '*' matches a prefix
+DEFAULT_IGNORED_PARAMS = "utm_*,gclid,gclsrc,dclid,fbclid,msclkid,yclid,igshid,mc_cid,mc_eid,_ga,_gl,_hsenc,_hsmi"
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Orders in which the frontier hands out URLs
+CRAWL_ORDERS = ('dfs', 'bfs', 'priority')
+
+# Function to compile a comma-separated list of ignored query parameters into (names, prefixes)
+def compile_ignore_rules(spec=None):
+    if spec is None:
+        spec = DEFAULT_IGNORED_PARAMS
+    names, prefixes = set(), []
+    for name in spec.split(','):
+        name = name.strip().lower()
+        if name.endswith('*'):
+            prefixes.append(name[:-1])
+        elif name:
+            names.add(name)
+    return frozenset(names), tuple(prefixes)
+
+DEFAULT_IGNORE_RULES = compile_ignore_rules()
+
+# Function to canonicalize a URL:
+#   lowercase scheme and host, drop default port and #fragment, drop ignored query parameters,
+#   sort the remaining ones, and (optionally) drop the trailing slash of non-root paths
+#   "/about/" and "/about" are different pages to relative links (and often a redirect apart),
+#   so the trailing slash is kept unless strip_trailing_slash is set
+def canonicalize_url(url, ignore_rules=DEFAULT_IGNORE_RULES, strip_trailing_slash=False):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    host = (parts.hostname or '').rstrip('.')
+    if ':' in host:
+        host = f"[{host}]"  # IPv6 literal
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        credentials = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{credentials}@{host}"
+
+    path = parts.path or '/'
+    if strip_trailing_slash and len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    query = ''
+    if parts.query:
+        names, prefixes = ignore_rules
+        params = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                  if key.lower() not in names and not key.lower().startswith(prefixes)]
+        query = urlencode(sorted(params))
+
+    return urlunsplit((scheme, host, path, query, ''))
+
+# Function to parse a comma-separated list of priority URL patterns, i.e. "/about,/careers"
+def parse_priorities(spec=None):
+    return tuple(pattern.strip().lower() for pattern in (spec or '').split(',') if pattern.strip())
+
+# Function to get the 64-bit fingerprint of a URL (never 0, which marks an empty slot)
+def url_fingerprint(url):
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+class FingerprintSet:
+    # Set of URLs kept as 64-bit fingerprints in one flat array (open addressing, linear probing):
+    # 11-23 bytes per URL, about 16 on average, instead of ~150 for a set of URL strings.
+    # Two URLs with the same fingerprint would make the second look seen; for a million URLs
+    # the odds of any such pair are about 1 in 40 million.
+    def __init__(self, urls=(), capacity=1024):
+        self._slots = array('Q', bytes(8 * capacity))  # capacity must be a power of two
+        self._size = 0
+        self.update(urls)
+
+    def _find(self, fingerprint):
+        # index of the fingerprint's slot, or of the empty slot where it belongs
+        slots = self._slots
+        mask = len(slots) - 1
+        index = fingerprint & mask
+        while slots[index] and slots[index] != fingerprint:
+            index = (index + 1) & mask
+        return index
+
+    def add(self, url):
+        fingerprint = url_fingerprint(url)
+        index = self._find(fingerprint)
+        if self._slots[index]:
+            return
+        self._slots[index] = fingerprint
+        self._size += 1
+        if self._size * 10 > len(self._slots) * 7:  # keep the table at most 70% full
+            self._grow()
+
+    def _grow(self):
+        old_slots = self._slots
+        self._slots = array('Q', bytes(16 * len(old_slots)))
+        for fingerprint in old_slots:
+            if fingerprint:
+                self._slots[self._find(fingerprint)] = fingerprint
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url):
+        return bool(self._slots[self._find(url_fingerprint(url))])
+
+    def __len__(self):
+        return self._size
+
+class BloomFilter:
+    # Fixed-size probabilistic set of URLs: about 1.8 bytes per URL at a 0.1% error rate, allocated
+    # up front for `capacity` URLs. A false positive makes an unseen URL look seen, so that page
+    # is skipped; past the capacity the error rate climbs quickly.
+    def __init__(self, urls=(), capacity=1000000, error_rate=0.001):
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._size = 0
+        self.update(urls)
+
+    def _positions(self, url):
+        # double hashing: k bit positions from one 128-bit digest
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, url):
+        added = False
+        for position in self._positions(url):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self._size += 1
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url):
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(url))
+
+    def __len__(self):
+        return self._size  # URLs added, not counting the ones that looked seen already
+
+class UrlFrontier:
+    # Crawl frontier backed by a set: a URL is queued at most once, however many pages link to it.
+    #   order      -- "dfs" pops the most recently found URL first (like the original crawl),
+    #                 "bfs" the oldest, "priority" the URL whose path matches the earliest of
+    #                 the priority patterns, then the shallowest
+    #   max_depth  -- URLs more than this many links away from the start are not queued (None: no limit)
+    #   priorities -- path substrings for the priority order, i.e. ("/about", "/careers")
+    #   seen_set   -- set-like object to track seen URLs in (i.e. a FingerprintSet); default: a set
+    def __init__(self, urls=(), seen=(), order='dfs', max_depth=None, priorities=(), seen_set=None):
+        if order not in CRAWL_ORDERS:
+            raise ValueError(f"Unknown crawl order {order!r}; use one of {', '.join(CRAWL_ORDERS)}")
+        self.order = order
+        self.max_depth = max_depth
+        self.priorities = priorities
+        self.queue = [] if order == 'priority' else deque()
+        self._sequence = count()  # keeps the priority order stable for equal priorities
+        self.seen = set() if seen_set is None else seen_set  # URLs queued or already visited
+        self.seen.update(seen)
+        for url in urls:
+            self.add(url)
+
+    # Function to queue a URL; returns False when it was queued or visited before, or is too deep
+    def add(self, url, depth=0):
+        if url in self.seen or not self.push(url, depth):
+            return False
+        self.seen.add(url)
+        return True
+
+    # Function to queue a URL without the seen check, for crawlers that track seen URLs themselves;
+    # returns False when the URL is too deep
+    def push(self, url, depth=0):
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if self.order == 'priority':
+            heapq.heappush(self.queue, (self.priority(url), depth, next(self._sequence), url))
+        else:
+            self.queue.append((url, depth))
+        return True
+
+    # Function to get the priority of a URL: the index of the first pattern in its path (lower is sooner)
+    def priority(self, url):
+        path = urlsplit(url).path.lower()
+        for index, pattern in enumerate(self.priorities):
+            if pattern in path:
+                return index
+        return len(self.priorities)
+
+    # Function to take the next URL to scan; returns (url, depth)
+    def pop(self):
+        if self.order == 'priority':
+            _, depth, _, url = heapq.heappop(self.queue)
+            return url, depth
+        if self.order == 'bfs':
+            return self.queue.popleft()
+        return self.queue.pop()
+
+    def __len__(self):
+        return len(self.queue)
@@ -0,0 +1,22 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Link extraction must skip malformed hrefs instead of aborting the crawl, and resolve
+relative hrefs against the URL the page was fetched from.
+------------------------------------------------------
+"""
+from idDEIA_scraper import extract_links
+
+def test_malformed_hrefs_are_skipped():
+    hrefs = ['http://other.example:99999/', 'http://www.example.gov:port/x', 'http://[::1/broken',
+             '/about/', 'staff.html']
+    links = extract_links(hrefs, 'https://www.example.gov/team/', 'www.example.gov')
+    assert links == ['https://www.example.gov/about/', 'https://www.example.gov/team/staff.html']
+
+def test_same_site_port_out_of_range_is_skipped():
+    assert extract_links(['https://www.example.gov:70000/a'], 'https://www.example.gov/', 'www.example.gov') == []
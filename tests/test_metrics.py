@@ -0,0 +1,43 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Only the main process writes the metrics file, so worker processes (SHARDS, idDEIA_batch)
+never race it over the temporary file.
+------------------------------------------------------
+"""
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from idDEIA_metrics import Metrics
+
+def write_metrics(metrics):
+    metrics.add('pages')
+    metrics.write()
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_worker_processes_do_not_write(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    metrics = Metrics()
+    metrics.configure(enabled=True, path=path)
+
+    context = multiprocessing.get_context("fork")  # like the SHARDS and idDEIA_batch workers on Linux
+    workers = [context.Process(target=write_metrics, args=(metrics,)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert not os.path.exists(path)
+
+    write_metrics(metrics)
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['counters'] == {'pages': 1}
+    assert os.listdir(tmp_path) == ["metrics.json"]
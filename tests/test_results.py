@@ -0,0 +1,33 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+A CSV results file is only appended to when its columns match, so a resumed scan with KWIC
+turned on or off never writes rows that do not fit the header.
+------------------------------------------------------
+"""
+import csv
+
+import pytest
+
+from idDEIA_results import PageResult, ResultsWriter
+
+def test_csv_columns_must_match(tmp_path):
+    path = str(tmp_path / "results.csv")
+    writer = ResultsWriter(path)
+    writer.write(PageResult("https://www.example.gov/", {"equity": 2}))
+    writer.close()
+
+    with pytest.raises(ValueError):
+        ResultsWriter(path, snippets=True)
+
+    writer = ResultsWriter(path)
+    writer.write(PageResult("https://www.example.gov/about", {"equal opportunity": 1}))
+    writer.close()
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert [len(row) for row in rows] == [3, 3, 3]
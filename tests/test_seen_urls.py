@@ -0,0 +1,46 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+Memory ceilings of the low-memory seen-URL sets: a FingerprintSet keeps at most 24 bytes
+per URL and a BloomFilter at most 2, measured with tracemalloc, and neither loses a URL
+that was added.
+------------------------------------------------------
+"""
+import tracemalloc
+
+import pytest
+
+from idDEIA_urls import BloomFilter, FingerprintSet
+
+URL_COUNT = 50000
+
+# Function to make the test URLs; they are made while tracing and released once added,
+# so only the memory the set keeps is measured
+def make_urls(limit=URL_COUNT, start=0):
+    return (f"https://www.example.gov/news/{2000 + index % 25}/article-{index}?page={index % 7}"
+            for index in range(start, start + limit))
+
+# Function to fill a new seen-URL set while tracing; returns (set, bytes per URL)
+def fill(new_set):
+    tracemalloc.start()
+    try:
+        seen = new_set()
+        seen.update(make_urls())
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seen, size / URL_COUNT
+
+@pytest.mark.parametrize('new_set, ceiling', [
+    (FingerprintSet, 24),
+    (lambda: BloomFilter(capacity=URL_COUNT), 2),
+], ids=['fingerprint', 'bloom'])
+def test_bytes_per_url_within_ceiling(new_set, ceiling):
+    seen, per_url = fill(new_set)
+    assert per_url <= ceiling, f"{per_url:.1f} bytes per URL, over the {ceiling} B ceiling"
+    assert all(url in seen for url in make_urls())  # no URL that was added is lost
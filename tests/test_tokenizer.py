@@ -0,0 +1,50 @@
+"""
+------------------------------------------------------
+Project Name: DEIA Compliance Scanner
+Author: Max J. Tsai
+Email: mt8168@gmail.com
+License: MIT License
+------------------------------------------------------
+Description:
+The fast regex tokenizer must count the same DEIA phrases as NLTK's word_tokenize on
+text with contractions, hyphenated words and punctuation.
+------------------------------------------------------
+"""
+import pytest
+
+from idDEIA_matcher import compile_dei_phrases
+from idDEIA_scraper import count_dei_phrases
+
+# A fixed stop word list, so the test does not need NLTK's stopwords corpus
+STOP_WORDS = frozenset(['a', 'and', 'are', 'for', 'in', 'is', 'of', 'our', 'the', 'to', 'we'])
+
+PHRASES = ['accessibility', 'affirmative action', 'bias', 'bias-free', 'diversity', 'equal opportunity',
+           'equity', 'equity-based', 'inclusion', 'non-discrimination']
+
+CORPUS = """
+We're committed to diversity, equity and inclusion. Our hiring isn't biased: it's bias-free!
+Equal opportunity (for everyone) is the rule; affirmative action isn't. Diversity? Yes -- diversity.
+The company's equity-based plan doesn't replace equity. Accessibility: "accessibility first."
+Non-discrimination, inclusion, and equal opportunity... in 2024, we'll keep our bias training.
+"""
+
+EXPECTED = {'accessibility': 2, 'affirmative action': 1, 'bias': 1, 'bias-free': 1, 'diversity': 3,
+            'equal opportunity': 2, 'equity': 2, 'equity-based': 1, 'inclusion': 2, 'non-discrimination': 1}
+
+# Function to check if NLTK and its punkt_tab tokenizer data are installed (the test never downloads them)
+def has_punkt():
+    try:
+        import nltk
+        nltk.data.find('tokenizers/punkt_tab')
+    except (ImportError, LookupError):
+        return False
+    return True
+
+def test_fast_tokenizer_counts():
+    matcher = compile_dei_phrases(PHRASES, STOP_WORDS)
+    assert count_dei_phrases(CORPUS, matcher, tokenizer='fast') == EXPECTED
+
+@pytest.mark.skipif(not has_punkt(), reason="NLTK punkt_tab data is not installed")
+def test_fast_and_nltk_tokenizers_count_the_same():
+    matcher = compile_dei_phrases(PHRASES, STOP_WORDS)
+    assert count_dei_phrases(CORPUS, matcher, tokenizer='nltk') == count_dei_phrases(CORPUS, matcher, tokenizer='fast')